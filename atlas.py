@@ -0,0 +1,160 @@
+"""Pack many trees seen from many angles into sprite atlas pages, with a JSON manifest.
+
+    python atlas.py 1-40 --species Oak --angles 8 --out atlas
+
+Every tree is generated and lit once, then drawn from each yaw. Frames are
+cropped to their drawn pixels and shelf-packed into --page sized PNGs in
+seed and angle order. A page is written as soon as it is full, so memory
+stays at one page plus the trees in flight. Each frame's pivot is where
+ORIGIN (the foot of the trunk) lands in the cropped frame.
+"""
+import argparse, json, os, time
+from math import pi
+from multiprocessing import Pool
+
+import numpy as np
+import pygame
+
+import main
+from main import Vec2
+from cache import TreeCache, generate_cached
+from export import imap_bounded
+from raster import Rasterizer, render
+from render import parse_seeds, to_surface
+
+_settings = None
+
+def _init_worker(settings):
+    global _settings
+    _settings = settings
+
+def crop(colour, mask):
+    """(colour, mask, x, y) cut down to the drawn pixels' bounding box, which starts at (x, y); None if nothing was drawn."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return None
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    return colour[y0:y1, x0:x1].copy(), mask[y0:y1, x0:x1].copy(), int(x0), int(y0)
+
+def render_views(seed, species, resolution, pitch, yaws, cache=None):
+    """The tree for seed from every yaw, as a list of (yaw, cropped frame or None, pivot)."""
+    tree, baked = generate_cached(cache, seed, species, main.LENGTH, main.light_params(), resolution / main.resolution)
+    geometry = main.tree_geometry(tree, baked)
+    rasterizer = Rasterizer(resolution)
+    origin = Vec2(resolution//2, resolution//4*3)
+    views = []
+    for yaw in yaws:
+        render(rasterizer, geometry, Vec2(pitch, yaw), origin)
+        frame = crop(rasterizer.colour, rasterizer.source != Rasterizer.EMPTY)
+        pivot = None if frame is None else (origin.x - frame[2], origin.y - frame[3])
+        views.append((yaw, frame, pivot))
+    return views
+
+def _views_job(seed):
+    species, resolution, pitch, yaws, cache_dir = _settings
+    cache = TreeCache(cache_dir) if cache_dir else None
+    return seed, render_views(seed, getattr(main, species), resolution, pitch, yaws, cache)
+
+class ShelfPacker:
+    """Places rectangles on size x size pages in arrival order: left to right along a shelf,
+    a new shelf under the tallest rectangle when the row is full, a new page when the page is.
+    """
+    def __init__(self, size, padding=1):
+        self.size = size
+        self.padding = padding
+        self.page = 0
+        self.x = 0
+        self.y = 0
+        self.shelf = 0
+
+    def place(self, width, height):
+        """(page, x, y) for a width x height rectangle."""
+        if width > self.size or height > self.size:
+            raise ValueError(f"{width}x{height} frame doesn't fit on a {self.size}x{self.size} page")
+        if self.x + width > self.size:
+            self.x = 0
+            self.y += self.shelf + self.padding
+            self.shelf = 0
+        if self.y + height > self.size:
+            self.page += 1
+            self.x = self.y = self.shelf = 0
+        placed = (self.page, self.x, self.y)
+        self.x += width + self.padding
+        self.shelf = max(self.shelf, height)
+        return placed
+
+class AtlasWriter:
+    """Draws packed frames into the current page and saves each page as it fills up."""
+    def __init__(self, directory, size, padding):
+        self.directory = directory
+        self.size = size
+        self.packer = ShelfPacker(size, padding)
+        self.pages = []
+        self.frames = []
+        self.page = None
+
+    def new_page(self):
+        self.page = (np.zeros((self.size, self.size, 3), dtype=np.uint8), np.zeros((self.size, self.size), dtype=bool))
+
+    def flush(self):
+        if self.page is None:
+            return
+        name = f"atlas{len(self.pages):03d}.png"
+        pygame.image.save(to_surface(*self.page), os.path.join(self.directory, name))
+        self.pages.append(name)
+        self.page = None
+
+    def add(self, info, frame, pivot):
+        if frame is None:
+            # nothing visible from this angle; still listed, with an empty rectangle
+            self.frames.append({**info, "page": None, "x": 0, "y": 0, "w": 0, "h": 0, "pivot": None})
+            return
+        colour, mask, _, _ = frame
+        height, width = mask.shape
+        page, x, y = self.packer.place(width, height)
+        if page != len(self.pages):
+            self.flush()
+        if self.page is None:
+            self.new_page()
+        self.page[0][y:y+height, x:x+width] = colour
+        self.page[1][y:y+height, x:x+width] = mask
+        self.frames.append({**info, "page": page, "x": x, "y": y, "w": width, "h": height, "pivot": list(pivot)})
+
+    def close(self, meta):
+        self.flush()
+        manifest = {"meta": meta, "pages": self.pages, "frames": self.frames}
+        with open(os.path.join(self.directory, "atlas.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Pack trees from several angles into sprite atlases.")
+    parser.add_argument("seeds", nargs="+", help="seeds, or inclusive ranges like 100-199")
+    parser.add_argument("--species", choices=["Oak", "Poplar"], default="Poplar")
+    parser.add_argument("--angles", type=int, default=8, help="yaws per tree, evenly around a full turn")
+    parser.add_argument("--pitch", type=float, default=pi/2)
+    parser.add_argument("--resolution", type=int, default=main.resolution)
+    parser.add_argument("--page", type=int, default=1024, help="atlas page width and height")
+    parser.add_argument("--padding", type=int, default=1, help="empty pixels between frames")
+    parser.add_argument("--out", default="atlas")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--cache", metavar="DIR", help="keep generated trees in DIR and reuse them")
+    args = parser.parse_args()
+
+    seeds = parse_seeds(args.seeds)
+    yaws = [i * 2*pi / args.angles for i in range(args.angles)]
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.time()
+    writer = AtlasWriter(args.out, args.page, args.padding)
+    settings = (args.species, args.resolution, args.pitch, yaws, args.cache)
+    with Pool(args.jobs, _init_worker, (settings,)) as pool:
+        for seed, views in imap_bounded(pool, _views_job, seeds, 2 * args.jobs):
+            for yaw, frame, pivot in views:
+                writer.add({"seed": seed, "species": args.species, "yaw": yaw}, frame, pivot)
+    writer.close({"resolution": args.resolution, "pitch": args.pitch, "angles": args.angles, "page": args.page})
+    elapsed = time.time() - start
+    print(f"{len(seeds)} trees, {len(writer.frames)} frames on {len(writer.pages)} pages in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main_cli()
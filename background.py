@@ -0,0 +1,59 @@
+import threading, traceback
+
+import pygame
+
+# posted with .request (and .result for TREE_READY) from the builder thread
+TREE_READY = pygame.event.custom_type()
+TREE_PROGRESS = pygame.event.custom_type()
+
+class Cancelled(Exception):
+    """Raised inside a build once a newer request has superseded it."""
+
+class BackgroundBuilder:
+    """Runs build(*args, progress=...) on a thread per request and posts the result back as a TREE_READY event.
+
+    Only the latest request counts. Each build reports through its progress
+    callback, which raises Cancelled once a newer request has been made, so
+    superseded builds stop at their next report. The event loop applies a
+    result by calling current(event) and swapping it in if that's true, so
+    the tree on screen changes in one go, on the main thread.
+    """
+    def __init__(self, build):
+        self.build = build
+        self.lock = threading.Lock()
+        self.request_id = 0
+        # (phase, fraction done) of the latest request, None when there's nothing in progress
+        self.progress = None
+
+    def request(self, *args):
+        with self.lock:
+            self.request_id += 1
+            request_id = self.request_id
+            self.progress = ("starting", 0.0)
+        threading.Thread(target=self._run, args=(request_id, args), daemon=True).start()
+        return request_id
+
+    def current(self, event):
+        """Whether event is the result of the latest request; if so, nothing is in progress any more."""
+        with self.lock:
+            if event.request != self.request_id:
+                return False
+            self.progress = None
+            return event.result is not None
+
+    def _run(self, request_id, args):
+        def progress(phase, fraction=0.0):
+            with self.lock:
+                if request_id != self.request_id:
+                    raise Cancelled
+                self.progress = (phase, fraction)
+            pygame.event.post(pygame.event.Event(TREE_PROGRESS, request=request_id))
+
+        try:
+            result = self.build(*args, progress=progress)
+        except Cancelled:
+            return
+        except Exception:
+            print(traceback.format_exc())
+            result = None
+        pygame.event.post(pygame.event.Event(TREE_READY, request=request_id, result=result))
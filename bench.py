@@ -0,0 +1,234 @@
+"""In-process benchmarks of every pipeline phase, over fixed seeds for both species.
+
+    python bench.py --out bench.json                 # run and save
+    python bench.py --compare bench.json             # run and flag regressions against a saved run
+    python bench.py --scaling                        # cost of each stage against output resolution
+    python bench.py --vectors                        # per-operation cost of vec.Vec3 against the old dict-backed class
+"""
+import argparse, json, platform, random, statistics, sys, time, timeit
+from math import pi
+
+import pygame
+
+import main
+from main import Vec2
+from present import Presenter
+from raster import Rasterizer, render
+from skeleton import build_skeleton
+from spatial import LeafIndex
+from tree import TreeGenerator
+from vec import Vec3
+
+SEEDS = [1, 2, 3, 42, 1720987585756419465]
+SPECIES = ["Oak", "Poplar"]
+PHASES = ["skeleton", "leaves", "index", "lighting", "raster", "present"]
+RESOLUTIONS = [100, 128, 256, 512, 1024]
+
+def timed(fn, warmup, repeats):
+    """Median and min wall time of fn() over repeats runs, after warmup untimed runs."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), min(times)
+
+def bench_tree(seed, species, resolution, warmup, repeats):
+    # each phase is timed on its own, fed by the previous phase's output
+    gen = TreeGenerator(seed, species, main.LENGTH)
+    tree = gen.generate()
+    baked = main.bake_lighting(tree)
+    geometry = main.tree_geometry(tree, baked)
+    rasterizer = Rasterizer(resolution)
+    origin = Vec2(resolution//2, resolution//4*3)
+    render(rasterizer, geometry, Vec2(pi/2, 0), origin)
+    presenter = Presenter(resolution, main.scl)
+    target = pygame.Surface((resolution * main.scl, resolution * main.scl))
+
+    def leaves():
+        gen.make_leaves(tree.skeleton.bushes)
+
+    ang = Vec2(pi/2, 0)
+    phases = {
+        "skeleton": lambda: gen.make_trunk_cloud(build_skeleton(species, random.Random(seed), main.LENGTH)),
+        "leaves": leaves,
+        "index": lambda: LeafIndex(tree.leaves),
+        # drop the tree's density grid each time so building it is timed too
+        "lighting": lambda: (tree.grids.clear(), main.bake_lighting(tree)),
+        "raster": lambda: render(rasterizer, geometry, ang, origin),
+        "present": lambda: presenter.present(target, rasterizer.colour),
+    }
+    results = {}
+    for name in PHASES:
+        median, best = timed(phases[name], warmup, repeats)
+        results[name] = {"median": median, "min": best}
+    results["counts"] = {"sections": len(tree.skeleton), "bushes": len(tree.skeleton.bushes), "leaves": len(tree.leaves)}
+    return results
+
+def run(seeds, resolution, warmup, repeats):
+    results = {}
+    for species in SPECIES:
+        per_seed = {}
+        for seed in seeds:
+            per_seed[str(seed)] = bench_tree(seed, getattr(main, species), resolution, warmup, repeats)
+        # per-phase total over all seeds, the number compare mode looks at
+        totals = {phase: sum(r[phase]["median"] for r in per_seed.values()) for phase in PHASES}
+        results[species] = {"total": totals, "seeds": per_seed}
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seeds": seeds,
+            "resolution": resolution,
+            "warmup": warmup,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+def bench_scaling(seed, species, resolutions, repeats):
+    """Generation, lighting and raster time against resolution, with the tree sampled for each resolution's zoom."""
+    results = {}
+    for resolution in resolutions:
+        zoom = resolution / main.resolution
+        gen = lambda: TreeGenerator(seed, species, main.LENGTH, zoom).generate()
+        tree = gen()
+        baked = main.bake_lighting(tree)
+        geometry = main.tree_geometry(tree, baked)
+        rasterizer = Rasterizer(resolution)
+        origin = Vec2(resolution//2, resolution//4*3)
+
+        def lighting():
+            tree.grids.clear()
+            main.bake_lighting(tree)
+
+        times = {
+            "generate": timed(gen, 0, repeats)[0],
+            "lighting": timed(lighting, 0, repeats)[0],
+            "raster": timed(lambda: render(rasterizer, geometry, Vec2(pi/2, 0), origin), 0, repeats)[0],
+        }
+        covered = int((rasterizer.source != Rasterizer.EMPTY).sum())
+        results[str(resolution)] = {"times": times, "leaves": len(tree.leaves), "trunk samples": len(tree.trunk.pos), "pixels": covered}
+    return results
+
+def report_scaling(scaling):
+    for species, results in scaling.items():
+        for resolution, r in results.items():
+            t = r["times"]
+            print(f"{species:8} {resolution:>5}px  generate {t['generate']*1000:9.2f}ms  lighting {t['lighting']*1000:9.2f}ms  "
+                  f"raster {t['raster']*1000:8.2f}ms  {r['leaves']:8} leaves  {r['pixels']:7} pixels")
+
+class DictVec3:
+    # the Vec3 main.py had before vec.py, kept to measure against
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def tup(self):
+        return (self.x, self.y, self.z)
+
+    def __add__(self, other):
+        if type(other) == type(self):
+            return DictVec3(self.x + other.x, self.y + other.y, self.z + other.z)
+        else:
+            raise TypeError(f"Can't add type '{type(other)}' to Vec3")
+
+    def __mul__(self, other):
+        if not type(other) == int and not type(other) == float:
+            raise TypeError(f"Can't multiply type '{type(other)}' with Vec3")
+        return DictVec3(self.x * other, self.y * other, self.z * other)
+
+VECTOR_OPS = {
+    "construct": "V(1.0, 2.0, 3.0)",
+    "add": "a + b",
+    "mul": "a * 0.5",
+    "iadd": "a += b",
+    "tup": "a.tup()",
+}
+
+def bench_vectors(number=200000):
+    """Nanoseconds per operation for each of VECTOR_OPS, for the old and new Vec3."""
+    results = {}
+    for name, stmt in VECTOR_OPS.items():
+        results[name] = {}
+        for label, cls in (("dict", DictVec3), ("slots", Vec3)):
+            setup = "a = V(1.0, 2.0, 3.0); b = V(0.5, 0.5, 0.5)"
+            best = min(timeit.repeat(stmt, setup, number=number, repeat=5, globals={"V": cls}))
+            results[name][label] = best / number * 1e9
+    return results
+
+def report_vectors(results):
+    for name, r in results.items():
+        print(f"{name:10} dict {r['dict']:7.1f}ns  slots {r['slots']:7.1f}ns  x{r['dict'] / r['slots']:.2f}")
+
+def compare(current, baseline, threshold):
+    """Print current vs baseline per species and phase; returns the (species, phase) pairs that got slower than threshold allows."""
+    regressions = []
+    for species, result in current["results"].items():
+        if species not in baseline["results"]:
+            continue
+        for phase, now in result["total"].items():
+            before = baseline["results"][species]["total"].get(phase)
+            if not before:
+                continue
+            ratio = now / before
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  REGRESSION"
+                regressions.append((species, phase))
+            print(f"{species:8} {phase:10} {before*1000:10.2f}ms -> {now*1000:10.2f}ms  x{ratio:.2f}{flag}")
+    return regressions
+
+def report(data):
+    for species, result in data["results"].items():
+        for phase, total in result["total"].items():
+            print(f"{species:8} {phase:10} {total*1000:10.2f}ms")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark tree generation and rendering phases.")
+    parser.add_argument("--seeds", type=int, nargs="+", default=SEEDS)
+    parser.add_argument("--resolution", type=int, default=main.resolution)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--out", help="write results as JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag phases slower than this saved run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before flagging, as a fraction")
+    parser.add_argument("--scaling", action="store_true", help="time the first seed at each of --resolutions instead")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=RESOLUTIONS)
+    parser.add_argument("--vectors", action="store_true", help="microbenchmark the scalar vector types instead")
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = bench_vectors()
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump({"vectors": vectors}, f, indent=2)
+        report_vectors(vectors)
+        return
+
+    if args.scaling:
+        scaling = {species: bench_scaling(args.seeds[0], getattr(main, species), args.resolutions, args.repeats) for species in SPECIES}
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump({"scaling": scaling}, f, indent=2)
+        report_scaling(scaling)
+        return
+
+    data = run(args.seeds, args.resolution, args.warmup, args.repeats)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(data, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(data, baseline, args.threshold):
+            sys.exit(1)
+    else:
+        report(data)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,169 @@
+import hashlib, json, os, tempfile
+
+import numpy as np
+
+from lighting import BakedLight
+from raster import TrunkCloud
+from skeleton import Skeleton
+from tree import GENERATOR_VERSION, Tree, TreeGenerator
+
+MAGIC = b"TREECACH"
+# arrays start on this boundary, so memory-mapped views are nicely aligned
+ALIGN = 64
+
+def species_hash(species):
+    """Stable hash of a species' parameters (its upper-case class attributes)."""
+    items = []
+    for name in sorted(dir(species)):
+        if not name.isupper():
+            continue
+        value = getattr(species, name)
+        if callable(value):
+            code = value.__code__
+            value = (code.co_code, code.co_consts, code.co_names)
+        elif hasattr(value, "x"):
+            value = (value.x, value.y)
+        items.append((name, value))
+    return hashlib.sha1(repr(items).encode()).hexdigest()
+
+def write_arrays(path, arrays, meta):
+    # MAGIC, 8-byte header length, JSON header, then each array's raw bytes at an ALIGN-ed offset
+    header = {"meta": meta, "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    encoded = json.dumps(header).encode()
+    start = -(-(len(MAGIC) + 8 + len(encoded)) // ALIGN) * ALIGN
+
+    # a name of its own, so threads and processes writing the same key don't share a temp file
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp", delete=False)
+    try:
+        with tmp as f:
+            f.write(MAGIC)
+            f.write(len(encoded).to_bytes(8, "little"))
+            f.write(encoded)
+            for name, array in arrays.items():
+                f.seek(start + header["arrays"][name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+        # readers never see a half-written file
+        os.replace(tmp.name, path)
+    finally:
+        # only still there if the write or the replace failed
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+def read_arrays(path):
+    """(arrays, meta) from a file written by write_arrays; arrays are read-only memory maps."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a tree cache file")
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length))
+        start = -(-(len(MAGIC) + 8 + length) // ALIGN) * ALIGN
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            shape = tuple(info["shape"])
+            if 0 in shape:
+                # mmap can't map nothing
+                arrays[name] = np.empty(shape, dtype=info["dtype"])
+            else:
+                # mapped from the open file, not the path, which another writer may have replaced since the header was read
+                arrays[name] = np.memmap(f, dtype=info["dtype"], mode="r", offset=start + info["offset"], shape=shape)
+    return arrays, header["meta"]
+
+class TreeCache:
+    """On-disk cache of generated and lit trees, one file per (seed, species parameters, generator version).
+
+    Files are memory-mapped on load. The cache is capped at max_bytes,
+    evicting least recently used files first (a hit bumps the file's mtime).
+    Several processes can share a directory: files are written whole with
+    os.replace, and ones another process evicts first are skipped.
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, seed, species, length, light, zoom=1.0):
+        # light is (light_dir, radius, transmittance, voxel); the baked values depend on it too
+        key = repr((seed, species_hash(species), length, zoom, light, GENERATOR_VERSION))
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".tree")
+
+    def get(self, seed, species, length, light, zoom=1.0):
+        """(tree, baked) if cached, else None."""
+        path = self.path(seed, species, length, light, zoom)
+        try:
+            arrays, meta = read_arrays(path)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process since; the mapping stays valid
+            pass
+        self.hits += 1
+
+        skeleton = Skeleton(
+            meta["length"], arrays["skeleton.pos"], arrays["skeleton.angles"], arrays["skeleton.width"],
+            arrays["skeleton.parent"], arrays["skeleton.is_trunk"], arrays["skeleton.inarow"], arrays["skeleton.bushes"],
+        )
+        trunk = TrunkCloud(arrays["trunk.pos"], arrays["trunk.width"], arrays["trunk.is_trunk"])
+        tree = Tree(seed, species, skeleton, arrays["leaves"], trunk, None, meta["timings"], zoom)
+        return tree, BakedLight(arrays["light.leaves"], arrays["light.trunk"])
+
+    def put(self, tree, baked, light):
+        s = tree.skeleton
+        arrays = {
+            "skeleton.pos": s.pos, "skeleton.angles": s.angles, "skeleton.width": s.width,
+            "skeleton.parent": s.parent, "skeleton.is_trunk": s.is_trunk, "skeleton.inarow": s.inarow,
+            "skeleton.bushes": s.bushes,
+            "leaves": tree.leaves,
+            "trunk.pos": tree.trunk.pos, "trunk.width": tree.trunk.width, "trunk.is_trunk": tree.trunk.is_trunk,
+            "light.leaves": np.asarray(baked.leaves), "light.trunk": np.asarray(baked.trunk),
+        }
+        meta = {"seed": tree.seed, "length": s.length, "timings": tree.timings}
+        write_arrays(self.path(tree.seed, tree.species, s.length, light, tree.zoom), arrays, meta)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tree"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # another process sharing the directory evicted it
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.evictions += 1
+
+def generate_cached(cache, seed, species, length, light, zoom=1.0, progress=None):
+    """(tree, baked) for seed: from cache when possible, otherwise generated, lit and stored. cache may be None.
+
+    progress is passed on to TreeGenerator.generate and Tree.bake.
+    """
+    if cache is not None:
+        found = cache.get(seed, species, length, light, zoom)
+        if found is not None:
+            return found
+    tree = TreeGenerator(seed, species, length, zoom).generate(progress)
+    baked = tree.bake(*light, progress=progress)
+    if cache is not None:
+        cache.put(tree, baked, light)
+    return tree, baked
@@ -0,0 +1,39 @@
+import numpy as np
+from math import cos, sin
+
+class Camera:
+    """View rotation for an ang: about z by ang.y, then about x by ang.x.
+
+    The forward and inverse matrices are only rebuilt when look() gets a
+    different angle, and points are projected a whole (N, 3) array at a time.
+    """
+    def __init__(self, ang=None):
+        self.key = None
+        self.forward = np.identity(3)
+        self.inverse = np.identity(3)
+        if ang is not None:
+            self.look(ang)
+
+    def look(self, ang):
+        key = (ang.x, ang.y)
+        if key == self.key:
+            return self
+        self.key = key
+        cosz, sinz = cos(ang.y), sin(ang.y)
+        cosx, sinx = cos(ang.x), sin(ang.x)
+        rotate_z = np.array([[cosz, -sinz, 0], [sinz, cosz, 0], [0, 0, 1]])
+        rotate_x = np.array([[1, 0, 0], [0, cosx, -sinx], [0, sinx, cosx]])
+        self.forward = rotate_x @ rotate_z
+        # rotations are orthonormal
+        self.inverse = self.forward.T.copy()
+        return self
+
+    def project(self, points):
+        """World (N, 3) points to view space: x right, y down the screen, z depth."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        return points @ self.forward.T
+
+    def unproject(self, points):
+        """View-space (N, 3) points back to world space."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        return points @ self.inverse.T
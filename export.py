@@ -0,0 +1,104 @@
+"""Export a turntable of one tree as a PNG sequence or straight into ffmpeg.
+
+    python export.py 1720987585756419465 --frames 120 --out frames
+    python export.py 1720987585756419465 --frames 120 --ffmpeg rotate.mp4
+
+The tree is generated and lit once; worker processes only rasterize.
+"""
+import argparse, io, os, subprocess, time
+from collections import deque
+from math import pi
+from multiprocessing import Pool
+
+import pygame
+
+import main
+from main import Vec2
+from raster import Rasterizer, render
+from tree import TreeGenerator
+
+_geometry = None
+_settings = None
+
+def _init_worker(geometry, settings):
+    global _geometry, _settings
+    _geometry = geometry
+    _settings = settings
+
+def render_frame(geometry, ang, resolution, scale):
+    """One frame as an (H, W, 3) uint8 array, upscaled by scale."""
+    rasterizer = Rasterizer(resolution)
+    render(rasterizer, geometry, ang, Vec2(resolution//2, resolution//4*3))
+    return rasterizer.colour.repeat(scale, axis=0).repeat(scale, axis=1)
+
+def _frame_job(yaw):
+    resolution, scale, pitch, png = _settings
+    frame = render_frame(_geometry, Vec2(pitch, yaw), resolution, scale)
+    if not png:
+        return frame.tobytes()
+    out = io.BytesIO()
+    pygame.image.save(pygame.surfarray.make_surface(frame.swapaxes(0, 1)), out, "frame.png")
+    return out.getvalue()
+
+def imap_bounded(pool, func, items, window):
+    # like pool.imap, but never more than window results in flight, so a slow consumer doesn't pile frames up in memory
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Export a rotating tree as frames.")
+    parser.add_argument("seed", type=int)
+    parser.add_argument("--species", choices=["Oak", "Poplar"], default="Poplar")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--step", type=float, default=None, help="yaw per frame, default is one full turn")
+    parser.add_argument("--pitch", type=float, default=pi/2)
+    parser.add_argument("--resolution", type=int, default=main.resolution)
+    parser.add_argument("--scale", type=int, default=4)
+    parser.add_argument("--out", default="frames", help="directory for the PNG sequence")
+    parser.add_argument("--ffmpeg", metavar="VIDEO", help="pipe raw frames into ffmpeg to write VIDEO instead")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    tree = TreeGenerator(args.seed, getattr(main, args.species), main.LENGTH, args.resolution / main.resolution).generate()
+    geometry = main.tree_geometry(tree, main.bake_lighting(tree))
+
+    step = args.step if args.step is not None else 2*pi / args.frames
+    yaws = (i * step for i in range(args.frames))
+    size = args.resolution * args.scale
+
+    sink = None
+    if args.ffmpeg:
+        sink = subprocess.Popen([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size}x{size}", "-r", str(args.fps), "-i", "-",
+            "-pix_fmt", "yuv420p", args.ffmpeg,
+        ], stdin=subprocess.PIPE)
+    else:
+        os.makedirs(args.out, exist_ok=True)
+
+    start = time.time()
+    settings = (args.resolution, args.scale, args.pitch, not args.ffmpeg)
+    try:
+        with Pool(args.jobs, _init_worker, (geometry, settings)) as pool:
+            for n, data in enumerate(imap_bounded(pool, _frame_job, yaws, 2 * args.jobs)):
+                if sink:
+                    sink.stdin.write(data)
+                else:
+                    with open(os.path.join(args.out, f"frame{n:04d}.png"), "wb") as f:
+                        f.write(data)
+    finally:
+        # even on error, so ffmpeg finishes what it has rather than being left behind
+        if sink:
+            sink.stdin.close()
+            sink.wait()
+    elapsed = time.time() - start
+    print(f"{args.frames} frames in {elapsed:.2f}s ({args.frames / elapsed:.2f} frames/s)")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,123 @@
+import os, random
+import numpy as np
+from math import ceil, pi
+
+# unit shells are identical for every bush of a species (only the radius changes), so build each once
+_shells = {}
+
+def frange_array(x, y, jump):
+    # same values as main.frange: np.cumsum adds sequentially, so the rounding matches x += jump
+    n = int((y - x) / jump) + 2
+    values = np.cumsum(np.concatenate(([x], np.full(n, jump))))
+    return values[values < y]
+
+def unit_shell(species, density=1.0, radius=1):
+    """(directions, radii) of a unit bush shell, sampled for a bush of up to radius world units at density pixels per unit.
+
+    Rows are spaced by arc length along the shell's profile, and each row's
+    ring gets as many points as its own circumference, so neighbouring
+    leaves are at most about a pixel apart on the squashed shell too.
+    """
+    radius = max(1, ceil(radius))
+    key = (species.LEAF_OVALNESS, species.LEAF_MAX_ELEVATION, density, radius)
+    if key in _shells:
+        return _shells[key]
+
+    c = species.LEAF_OVALNESS
+    scale = radius * density
+    # the profile of the shell (round about z) from the top down, in pixels along it
+    profile = np.linspace(0, min(species.LEAF_MAX_ELEVATION, pi), 1024)
+    ρ = c / np.sqrt(c**2 * np.cos(profile)**2 + np.sin(profile)**2)
+    arc = np.concatenate(([0], np.cumsum(np.hypot(np.diff(ρ * np.sin(profile)), np.diff(ρ * np.cos(profile)))))) * scale
+    rows = ceil(arc[-1]) + 1
+    elevations = np.interp(np.linspace(0, arc[-1], rows), arc, profile)
+
+    ring = c / np.sqrt(c**2 * np.cos(elevations)**2 + np.sin(elevations)**2) * np.sin(elevations)
+    counts = np.maximum(1, np.ceil(2*pi * ring * scale)).astype(np.int64)
+    γ = np.repeat(elevations, counts)
+    # position of each point within its ring
+    n = np.arange(len(γ)) - np.repeat(np.cumsum(counts) - counts, counts)
+    λ = -pi + 2*pi * n / np.repeat(counts, counts)
+
+    radius = c / np.sqrt(c**2 * np.cos(γ)**2 + np.sin(γ)**2)
+    dirs = np.stack((
+        np.sin(γ) * np.cos(λ),
+        np.sin(γ) * np.sin(λ),
+        np.cos(γ),
+    ), axis=1)
+    dirs.flags.writeable = False
+    radius.flags.writeable = False
+    _shells[key] = dirs, radius
+    return dirs, radius
+
+def original_shell_size(species):
+    # points in the shell every bush used to get (40 a circle on 0.1 rad rows), which lighting was tuned for
+    d = pi/2
+    elevations = frange_array(0, species.LEAF_MAX_ELEVATION, 0.1)
+    total = 0
+    for elevation in elevations[elevations <= pi]:
+        num_points = (1-((elevation-d)/d)**2) * 40 or 1
+        total += len(frange_array(-pi, pi, 2*pi/num_points))
+    return total
+
+def leaf_weight(species, bushes, leaves):
+    """Points the original shells would have per leaf actually generated; what each leaf counts for in lighting.
+
+    So a tree blocks about as much light however densely its shells are sampled.
+    """
+    return bushes * original_shell_size(species) / leaves if leaves else 1.0
+
+def bush_radii(seed, species, count, start=0):
+    """Max radius of bushes start to start + count, each drawn from its own random stream seeded by (seed, bush index).
+
+    So a bush's leaves don't depend on any other bush, or on which process
+    generates them or in what order.
+    """
+    return [random.Random(f"{seed}/{i}").uniform(species.LEAF_MIN_RAD, species.LEAF_MAX_RAD) for i in range(start, start + count)]
+
+def bush_shells(species, density, max_radii):
+    # the unit shell each bush is sampled with, keyed by ceil(radius) as unit_shell caches them
+    return {ceil(r): unit_shell(species, density, r) for r in max_radii}
+
+def shell_points(bush_positions, max_radii, shells):
+    """Every bush's leaf points, bush by bush, each bush scaled from shells[ceil(its radius)]."""
+    bush_positions = np.asarray(bush_positions, dtype=np.float64).reshape(-1, 3)
+    max_radii = np.asarray(max_radii, dtype=np.float64)
+    if len(bush_positions) == 0:
+        return np.empty((0, 3))
+    points = []
+    for position, max_radius in zip(bush_positions, max_radii):
+        dirs, radius = shells[ceil(max_radius)]
+        points.append(position + dirs * (radius * max_radius)[:, None])
+    return np.concatenate(points)
+
+def make_leaf_points(bush_positions, max_radii, species, density=1.0):
+    """All bushes' leaf points as one contiguous (N, 3) array, bush by bush in input order."""
+    return shell_points(bush_positions, max_radii, bush_shells(species, density, max_radii))
+
+def _leaf_job(job):
+    return shell_points(*job)
+
+def make_leaf_points_parallel(pool, bush_positions, max_radii, species, density=1.0, chunks=None):
+    """make_leaf_points with bushes split across pool's workers.
+
+    Each worker sends back one contiguous array for its run of bushes, which
+    lands at that run's offset in the result, so the output is identical to
+    make_leaf_points whatever the number of workers.
+    """
+    bush_positions = np.asarray(bush_positions, dtype=np.float64).reshape(-1, 3)
+    max_radii = np.asarray(max_radii, dtype=np.float64)
+    shells = bush_shells(species, density, max_radii)
+    # where each bush's points start in the result
+    offsets = np.cumsum([0] + [len(shells[ceil(r)][1]) for r in max_radii])
+    chunks = chunks or 4 * os.cpu_count()
+    bounds = np.linspace(0, len(bush_positions), min(chunks, len(bush_positions)) + 1).astype(np.int64)
+    jobs = [
+        (bush_positions[a:b], max_radii[a:b], {ceil(r): shells[ceil(r)] for r in max_radii[a:b]})
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+
+    points = np.empty((offsets[-1], 3))
+    for a, chunk in zip(bounds, pool.imap(_leaf_job, jobs)):
+        points[offsets[a]:offsets[a] + len(chunk)] = chunk
+    return points
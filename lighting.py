@@ -0,0 +1,55 @@
+import numpy as np
+from collections import namedtuple
+
+from stats import STATS
+
+# light values in [0, 1]: one per leaf point, one per trunk sample
+BakedLight = namedtuple("BakedLight", ["leaves", "trunk"])
+
+class LightCache:
+    """Baked lighting for the current tree, rebuilt only when its key changes.
+
+    The key should cover everything the lighting depends on (tree, species,
+    light direction). It is compared on every lookup, so changing any of
+    them invalidates the bake without anyone having to remember to.
+    """
+    def __init__(self, bake):
+        self.bake = bake
+        self.key = None
+        self.value = None
+        self.bakes = 0
+
+    def get(self, key):
+        if self.key != key:
+            self.value = self.bake()
+            self.key = key
+            self.bakes += 1
+        return self.value
+
+    def put(self, key, value):
+        # for lighting that was baked elsewhere (e.g. loaded with a cached tree)
+        self.key = key
+        self.value = value
+
+    def invalidate(self):
+        self.key = None
+
+def raycast_many(origins, index, light_dir, radius, transmittance, steps=30, on_step=None):
+    """Light reaching each of origins (an (N, 3) array), marching all rays towards light_dir in lock-step.
+
+    Each step asks index (a LeafIndex or DensityGrid) for the leaves within
+    radius of every ray at once; each of those leaves lets transmittance of
+    the light through. on_step, if given, is called with the fraction done
+    after every step.
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    light_dir = np.asarray(light_dir, dtype=np.float64)
+    rays = origins + light_dir * radius
+    light = np.ones(len(origins))
+    for i in range(steps):
+        light *= transmittance ** index.query_many(rays, radius)
+        rays += light_dir
+        if on_step:
+            on_step((i + 1) / steps)
+    STATS.count("raycast steps", steps * len(origins))
+    return light
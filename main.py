@@ -1,61 +1,19 @@
 import pygame
 from math import *
-import random, time, colorsys
+import os, sys, time, colorsys
 import traceback
+import numpy as np
+from lighting import LightCache
+import raster
+from raster import Geometry, Rasterizer
+from camera import Camera
+from cache import TreeCache, generate_cached
+from present import FrameCache, Presenter
+from stats import STATS
+from background import TREE_READY, BackgroundBuilder
+from vec import Vec2, Vec3
 
 
-class Vec2:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-    def tup(self):
-        return (self.x, self.y)
-
-    def __add__(self, other):
-        if type(other) == type(self):
-            return Vec2(self.x + other.x, self.y + other.y)
-        else:
-            raise TypeError(f"Can't add type '{type(other)}' to Vec2")
-
-    def __mul__(self, other):
-        if not type(other) == int or type(other) == float:
-            raise TypeError(f"Can't multiply type '{type(other)}' with Vec2")
-        return Vec2(self.x * other, self.y * other)
-    def __repr__(self):
-        return f"Vec2({self.x}, {self.y})"
-
-class Vec3:
-    def __init__(self, x, y, z):
-        self.x = x
-        self.y = y
-        self.z = z
-
-    def xy(self) -> Vec2:
-        return Vec2(self.x, self.y)
-
-    def __add__(self, other):
-        if type(other) == type(self):
-            return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
-        else:
-            raise TypeError(f"Can't add type '{type(other)}' to Vec3")
-    def __sub__(self, other):
-        if type(other) == type(self):
-            return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
-        else:
-            raise TypeError(f"Can't sub type '{type(other)}' to Vec3")
-
-    def __mul__(self, other):
-        if not type(other) == int and not type(other) == float:
-            raise TypeError(f"Can't multiply type '{type(other)}' with Vec3")
-        return Vec3(self.x * other, self.y * other, self.z * other)
-    def __addeq__(self, other):
-        self.x += other.x
-        self.y += other.y
-        self.z += other.z
-    def __repr__(self):
-        return f"Vec2({self.x}, {self.y}, {self.z})"
-
 def spherical(angles):
     return Vec3(
         sin(angles.x) * cos(angles.y),
@@ -63,107 +21,6 @@ def spherical(angles):
         cos(angles.x)
     )
 
-def rotateX(coords, rad):
-    cosa = cos(rad)
-    sina = sin(rad)
-    y = coords.y * cosa - coords.z * sina
-    z = coords.y * sina + coords.z * cosa
-    return Vec3(coords.x, y, z)
-
-def rotateY(coords, rad):
-    cosa = cos(rad)
-    sina = sin(rad)
-    z = coords.z * cosa - coords.x * sina
-    x = coords.z * sina + coords.x * cosa
-    return Vec3(x, coords.y, z)
-
-def rotateZ(coords, rad):
-    cosa = cos(rad)
-    sina = sin(rad)
-    x = coords.x * cosa - coords.y * sina
-    y = coords.x * sina + coords.y * cosa
-    return Vec3(x, y, coords.z)
-
-class Octree:
-    MAX_MEMBERS = 10
-    def __init__(self, origin: Vec3, rad: float):
-        self.children = []
-        self.points = []
-        self.centre = origin
-        self.rad = rad
-        self.leaf = True
-        
-    def add(self, point: Vec3):
-        if self.leaf:
-            self.points.append(point)
-            if len(self.points) > self.MAX_MEMBERS:# and self.rad > 1 * LEAF_RAD:
-                self.subdivide()
-        else:
-            top   = int(point.x > self.centre.x)
-            left  = int(point.y > self.centre.y)
-            front = int(point.z > self.centre.z)
-            index = top << 2 | left << 1 | front
-            self.children[index].add(point)
-
-    def subdivide(self):
-        self.leaf = False
-        r = self.rad / 2
-        for i in range(8):
-            top =   ((i >> 2) & 1) * 2 - 1
-            left =  ((i >> 1) & 1) * 2 - 1
-            front = ((i >> 0) & 1) * 2 - 1
-            self.children.append(Octree(self.centre + Vec3(r * top, r * left, r * front), r))
-
-        # re-add now we're no longer a leaf
-        for point in self.points:
-            self.add(point)
-
-    def draw(self):
-        vertices = []
-        for i in range(8):
-            top =   ((i >> 2) & 1) * 2 - 1
-            left =  ((i >> 1) & 1) * 2 - 1
-            front = ((i >> 0) & 1) * 2 - 1
-            vertices.append(self.centre + Vec3(top, left, front) * self.rad)
-
-        for a, b in [
-            (0b000, 0b001), (0b000, 0b010), (0b000, 0b100),
-            (0b001, 0b011), (0b001, 0b101), (0b101, 0b100),
-            (0b101, 0b111), (0b010, 0b110), (0b010, 0b011),
-            (0b011, 0b111), (0b110, 0b111), (0b110, 0b100),
-        ]:
-            pos_a = vertices[a]
-            pos_b = vertices[b]
-            a_ss = (rotateX(rotateZ(pos_a, ang.y), ang.x).xy() + ORIGIN) * scl
-            b_ss = (rotateX(rotateZ(pos_b, ang.y), ang.x).xy() + ORIGIN) * scl
-            pygame.draw.line(screen, (255, 0, 255), a_ss.tup(), b_ss.tup())
-
-        # for c in self.children:
-        #     c.draw()
-
-    def query(self, pos) -> int:
-        # self.draw()
-        if self.leaf:
-            count = 0
-            for point in self.points:
-                if pos == point:
-                    continue
-                dist = (point.x - pos.x) * (point.x - pos.x) +\
-                       (point.y - pos.y) * (point.y - pos.y) +\
-                       (point.z - pos.z) * (point.z - pos.z)
-                if dist < LEAF_RAD * LEAF_RAD:
-                    count += 1
-            return count
-
-        top   = int(pos.x > self.centre.x)
-        left  = int(pos.y > self.centre.y)
-        front = int(pos.z > self.centre.z)
-        index = top << 2 | left << 1 | front
-        # self.children[index].draw()
-        return self.children[index].query(pos)
-
-            
-
 class Oak:
     MAX_WIDTH = 8
     BRANCH_BIAS = pi/4
@@ -198,8 +55,10 @@ class Oak:
     BRANCH_EXTRA = 1.2
     TRUNK_EXTRA = 1.2
 
-    # chance, based on width, to go straight, rather than branching
-    STRAIGHT_CHANCE = lambda width, is_trunk: (width/(sqrt(1/(Oak.MAX_STRAIGHT_CHANCE - Oak.MIN_STRAIGHT_CHANCE)) * Oak.MAX_WIDTH)) ** 2 + Oak.MIN_STRAIGHT_CHANCE
+    # chance, based on width, to go straight, rather than branching. A classmethod so subclasses overriding the constants get them used
+    @classmethod
+    def STRAIGHT_CHANCE(cls, width, is_trunk):
+        return (width/(sqrt(1/(cls.MAX_STRAIGHT_CHANCE - cls.MIN_STRAIGHT_CHANCE)) * cls.MAX_WIDTH)) ** 2 + cls.MIN_STRAIGHT_CHANCE
 
     # how squished the leaves look. < 1 -> tall and skinny, > 1 -> short and fat, = 1 -> spherical
     LEAF_OVALNESS = 1
@@ -213,6 +72,9 @@ class Oak:
     # maximum elevation of the leaves, in effect cutting off the leaf bundle from the bottom
     LEAF_MAX_ELEVATION = 3*pi/5
 
+    # how much light each leaf blocks, as a power of LEAF_TRANSMITTANCE
+    LEAF_OPACITY = 1
+
 class Poplar:
     MAX_WIDTH = 8
     BRANCH_BIAS = pi/8
@@ -247,7 +109,9 @@ class Poplar:
     BRANCH_EXTRA = 5
     TRUNK_EXTRA = 1.1
 
-    STRAIGHT_CHANCE = lambda width, is_trunk: 0.2 if is_trunk else 0.9
+    @classmethod
+    def STRAIGHT_CHANCE(cls, width, is_trunk):
+        return 0.2 if is_trunk else 0.9
 
     # how squished the leaves look. < 1 -> tall and skinny, > 1 -> short and fat, = 1 -> spherical
     LEAF_OVALNESS = 0.3
@@ -260,14 +124,34 @@ class Poplar:
 
     # maximum elevation of the leaves, in effect cutting off the leaf bundle from the bottom
     LEAF_MAX_ELEVATION = pi
+
+    # how much light each leaf blocks, as a power of LEAF_TRANSMITTANCE
+    LEAF_OPACITY = 0.24
     
 
 TT = Poplar
 correct = True
 debug_leaves = False
 
-leaves = []
-bush_positions = []
+class PointView:
+    """Read-only sequence of Vec3 over an (N, 3) point array, for code that still wants objects"""
+    def __init__(self, points):
+        self.points = points
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, i):
+        x, y, z = self.points[i].tolist()
+        return Vec3(x, y, z)
+
+    def __iter__(self):
+        for x, y, z in self.points.tolist():
+            yield Vec3(x, y, z)
+
+leaf_points = np.empty((0, 3))
+leaves = PointView(leaf_points)
+bush_positions = np.empty((0, 3))
 
 def frange(x, y, jump):
   while x < y:
@@ -277,213 +161,27 @@ def frange(x, y, jump):
 def lerp(a, b, t):
     return a + (b-a) * t
 
-class Section:
-    def __init__(self, length, width, pos, angles):
-        self.length = length
-        self.width = width
-        self.pos = pos
-        self.angles = angles
-        self.children = []
-        self.bias = 0
-        self.end_pos = spherical(self.angles) * self.length + self.pos
-
-    def tree(self, inarow, bias: Vec2, is_trunk):
-        self.bias = bias
-        self.inarow = inarow
-        self.is_trunk = is_trunk
-        if self.width < 1:
-            bush_positions.append(self.pos)
-            return
-
-        bias_factor = abs(self.angles.x - bias.x)
-        bias_input = Vec2(0, 0)
-        if bias_factor < TT.MAX_DEVIATION.x:
-            bias_input.x = 0
-        elif self.angles.x > bias.x:
-            bias_input.x = -bias_factor * TT.BIAS_STRENGTH
-        else:
-            bias_input.x = bias_factor * TT.BIAS_STRENGTH
-
-        if bias.y is not None:
-            bias_factor = abs(self.angles.y - bias.y)
-            if bias_factor < TT.MAX_DEVIATION.y:
-                bias_input.y = 0
-            elif self.angles.y > bias.y:
-                bias_input.y = -bias_factor * TT.BIAS_STRENGTH
-            else:
-                bias_input.y = bias_factor * TT.BIAS_STRENGTH
-
-        straight_chance = TT.STRAIGHT_CHANCE(self.width, self.is_trunk)
-
-        # make the trunk longer
-        if self.width >= TT.MIN_LOWER_TRUNK_WIDTH and inarow < TT.MIN_LOWER_TRUNK_LENGTH:
-            straight_chance = 1
-        
-        n = TT.MAX_WIDTH
-        # TODO make parameter
-        if random.random() > straight_chance or inarow > (-5/(n-1)*self.width + 5/(n-1)*n + 8):
-            self.branch(bias_input)
-        else:
-            self.go_straight(bias_input)
-
-    def straight_branch_angles(self, bias_input: Vec2):
-        return Vec2(
-            self.angles.x + random.gauss(bias_input.x, TT.STRAIGHT_DEVIATION_STDDEV.x),
-            self.angles.y + random.gauss(bias_input.y, TT.STRAIGHT_DEVIATION_STDDEV.y),
-        )
-    
-    def go_straight(self, bias_input: Vec2):
-        angles = self.straight_branch_angles(bias_input)
-        next = Section(self.length, self.width * (TT.STRAIGHT_WIDTH_TRUNK_MULTIPLIER if self.is_trunk else TT.STRAIGHT_WIDTH_BRANCH_MULTIPLIER), self.end_pos, angles)
-        next.tree(self.inarow + 1, self.bias, self.is_trunk)
-        self.children = [next]
-
-    def branch(self, bias_input: Vec2):
-        if self.width > TT.MIN_TRUNK_WIDTH:
-            branch_chance = (log(self.width-TT.MIN_TRUNK_WIDTH)/log(TT.MAX_WIDTH-TT.MIN_TRUNK_WIDTH)+1)/2 * TT.MAX_BRANCH_CHANCE
-        else:
-
-            branch_chance = 0
-
-        if random.random() < branch_chance and self.is_trunk:
-            angles, widths, biases, trunks = self.branch_off_trunk(bias_input)
-        else:
-            angles, widths, biases, trunks = self.branch_equally()
-        
-        self.children = [Section(self.length, width, self.end_pos, angle) for width, angle in zip(widths, angles)]
-        self.children[0].tree(0, biases[0], trunks[0])
-        self.children[1].tree(0, biases[1], trunks[1])
-        
-    def branch_off_trunk(self, bias_input):
-        angles = [
-            self.straight_branch_angles(bias_input),
-            Vec2(
-                self.angles.x + random.uniform(pi/8, pi/2 - self.angles.x),
-                self.angles.y + random.uniform(-pi, pi),
-            )
-        ]
-        main_width = random.uniform(self.width * 0.85, self.width * 0.86)
-        widths = [
-            main_width * TT.TRUNK_EXTRA,
-            (self.width - main_width) * TT.BRANCH_EXTRA
-        ]
-
-        biases = [Vec2(0, None), Vec2(TT.BRANCH_BIAS, angles[1].y)]
-        trunks = [True, False]
-
-        return angles, widths, biases, trunks
-
-    def branch_equally(self):
-        # TODO maybe generalise this? have some angle between forks, and some rotation angle (i.e. are the forks going sideways from eachother or up/down or inbetween), and calculate azimuth and elevation from that
-        # if we're going basically up, then make a fork i.e. like a Y shape
-        if self.angles.x < pi/8:
-            angles = self.get_fork_angles()
-        else:
-            # otherwise just branch randomly basically ecksdee
-            # TODO bias towards going in the same direction or something
-            angles = [
-                Vec2(
-                    self.angles.x + random.gauss(pi/16, pi/32),
-                    self.angles.y + random.gauss(3*pi/8, pi/10),
-                ),
-                Vec2(
-                    self.angles.x - random.gauss(pi/16, pi/32),
-                    self.angles.y - random.gauss(3*pi/8, pi/10),
-                )
-            ]
-
-        if self.is_trunk and self.width > TT.MIN_TRUNK_WIDTH:
-            biases = [Vec2(angles[0].x, None), Vec2(angles[1].x, None)]
-            trunks = [True, True]
-        else:
-            biases = [Vec2(TT.BRANCH_BIAS, angles[0].y), Vec2(TT.BRANCH_BIAS, angles[1].y)]
-            # biases = [angles[0].x, angles[1].x]
-            trunks = [False, False]
-
-        def clamp(x):
-            if x.x > pi/4:
-                x.x = pi/4
-            if x.x < -pi/4:
-                x.x = -pi/4
-            return x
-        biases = [clamp(b) for b in biases]
-        # TT.TODO different branching logic for big vs small branches
-        # big branches should aim to get away from the others (bias branches to go away from the centre) and be relatively long
-
-        # when branching, consider the current angle to decide what kind of yaw/azimuth the branch can be at. if going relatively up, any yaw angle is permitted, if going sideways, bias towards that direction.
-        # punish getting too far from the tree, or too close ot other branches
-        width = random.gauss(0.5, 0.1) * self.width
-        widths = [
-            width * TT.TRUNK_EXTRA,
-            (self.width - width) * TT.TRUNK_EXTRA
-        ]
-
-        return angles, widths, biases, trunks
-
-    def get_fork_angles(self):
-        # make sure branches are somewhat different direction to eachother
-        azimuth_difference = random.uniform(TT.FORK_AZIMUTH_DIFFERENCE_MEAN, TT.FORK_AZIMUTH_DIFFERENCE_STDDEV)
-        azimuth_a = random.uniform(0, 2*pi)
-        azimuth_b = azimuth_a + azimuth_difference
-
-        elevation_a = abs(random.gauss(self.angles.x + TT.FORK_ELEVATION_MEAN, TT.FORK_ELEVATION_STDDEV))
-        elevation_b = abs(random.gauss(self.angles.x + TT.FORK_ELEVATION_MEAN, TT.FORK_ELEVATION_STDDEV))
-        
-        return [
-            Vec2(elevation_a, azimuth_a),
-            Vec2(elevation_b, azimuth_b),
-        ]
-
-    def draw(self, ang: Vec2):
-        global buf
-        # stroke_width(int(self.width) * scl)
-        if DRAW_LINE:
-            end_pos = spherical(self.angles) * self.length + self.pos
-            end_pos = rotateX(rotateZ(end_pos, ang.y), ang.x)
-            start_pos = rotateX(rotateZ(self.pos, ang.y), ang.x)
-            hue = 0.5 if self.is_trunk else 0.0
-            value = (-end_pos.z + 30) / 60
-            if value > 1: value = 1
-            if value < 0: value = 0
-            r, g, b = colorsys.hsv_to_rgb(hue, 1, value)
-            col = (int(r*255), int(g*255), int(b*255))
-
-            end_pos = end_pos.xy() + ORIGIN
-            start_pos = start_pos.xy() + ORIGIN
-            pygame.draw.line(screen, col, (start_pos.x * scl, start_pos.y * scl), (end_pos.x* scl, end_pos.y * scl))
-        if DRAW_PX:
-            for n in range(0, int(self.length)):
-                end_pos = spherical(self.angles) * n + self.pos
-                end_pos_ss = rotateX(rotateZ(end_pos, ang.y), ang.x)
-                actual_width = round(self.width / TT.MAX_WIDTH * 2.8) + 1
-
-                
-                for dx in range(actual_width):
-                    dy = 0
-                    x = int(end_pos_ss.x + dx - actual_width/2) + ORIGIN.x
-                    y = int(end_pos_ss.y + dy - actual_width/2) + ORIGIN.y
-                    depth = buf[y * resolution + x][1]
-                    if end_pos_ss.z < depth:
-                        pixel_ws = rotateZ(rotateX(Vec3(x, y, end_pos_ss.z) - Vec3(ORIGIN.x, ORIGIN.y, 0), -ang.x), -ang.y)
-                        
-                        light = raycast(pixel_ws)
-                        col = TRUNK_COLOURS[int(light * (len(TRUNK_COLOURS) - 1))]
-                        buf[y*resolution+x] = [col, end_pos_ss.z, False]
-        for c in self.children:
-            c.draw(ang)
-
 scl = 12
 DRAW_LINE = False
 DRAW_PX = True
 LENGTH = 2
 resolution = 100
 w, h = resolution*scl, resolution*scl
-pygame.init()
-screen = pygame.display.set_mode((w, h))
+# the window is only opened by main(), so the generator and renderer can be imported headless
+screen = None
 
 ORIGIN = Vec2(resolution//2, resolution//4*3)
 LEAF_RAD = 3
+# fraction of light let through per leaf within LEAF_RAD of a ray step (scaled by each species' LEAF_OPACITY).
+# The old octree only counted the few points sharing the step's cell, real neighbour counts are far higher,
+# hence not 0.98 any more. Fitted, with LIGHT_WHITE, so the palette entries come out in about the old proportions
+LEAF_TRANSMITTANCE = 0.99902
 LIGHT_DIR = Vec3(0, 1/sqrt(2), 1/sqrt(2)) * 1
+# light at or above this gets the brightest palette colour. Nothing is ever completely unshaded now that every
+# neighbouring leaf counts, which is all the old octree needed for it
+LIGHT_WHITE = 0.95
+# voxel size of the leaf density grid lighting is looked up in; None counts leaves exactly (about 10x slower)
+LIGHT_VOXEL = 1.0
 # LEAF_COLOURS = [
 # "#1F2E52",
 # "#223D54",
@@ -512,8 +210,6 @@ LIGHT_DIR = Vec3(0, 1/sqrt(2), 1/sqrt(2)) * 1
 
 # LEAF_COLOURS = ["354341", "446d4d", "78944b", "abae54"]
 
-random.seed(1720987585756419465)
-
 MAX_HUE_SHIFT = 0.2
 NUM_COLOURS = 5
 MIN_VALUE = 0.2
@@ -544,7 +240,6 @@ def parse_html(code):
 # LEAF_COLOURS = [parse_html(col) for col in LEAF_COLOURS]
 TRUNK_COLOURS = [parse_html(col) for col in TRUNK_COLOURS]
 
-import numpy as np
 import scipy as sp
 import scipy.optimize
 
@@ -565,174 +260,141 @@ def angles_in_ellipse(
         angles = res.x 
     return angles
 
-def make_leaves():
-    for bush_pos in bush_positions:
-        # # TODO leaf clumping??
-        # for i in range(random.randint(200, 400)):
-        #     azimuth = random.uniform(-pi, pi)
-        #     elevation = random.uniform(0, pi/2)
-        #     dir = spherical(Vec2(elevation, azimuth))
-        #     radius = random.uniform(max_radius - 1, max_radius)
-        #     offset = dir * radius
-        #     pos = self.pos + offset
-        #     leaves.append(pos)
-
-        max_radius = random.uniform(TT.LEAF_MIN_RAD, TT.LEAF_MAX_RAD)
-        max_elevation = TT.LEAF_MAX_ELEVATION
-        # for elevation in frange(0, max_elevation, 0.8 / max_radius):
-
-        a, b = 1, 1
-        c = TT.LEAF_OVALNESS
-        for elevation in frange(0, max_elevation, 0.1):
-        # for elevation in angles_in_ellipse(50, c, 1):
-            if elevation > pi: continue
-            # print(elevation)
-            # max_step = 1
-            # min_step = 0.5
-            # a = 2*(max_step - min_step)/pi
-            x = elevation
-            # step = abs((a*x-pi/2*a))+min_step
-            # step = max_step * sqrt(1-(x - pi/2)**2 / (pi/2)**2) + max_step + min_step
-            points_per_circle = 40
-            d = pi/2
-            num_points = b*(1-((x-d)/d)**2) * points_per_circle
-            if num_points == 0:
-                num_points = 1
-            step = 2*pi/num_points
-            for azimuth in frange(-pi, pi, step):
-                γ = elevation
-                λ = azimuth
-                actual_radius = a*b*c/sqrt(c**2*(b**2*cos(λ)**2+a**2*sin(λ)**2)*cos(γ)**2 + a**2*b**2*sin(γ)**2) * max_radius
-                radius = actual_radius#random.uniform(actual_radius - TT.LEAF_RAD_RANDOM_OFFSET, actual_radius)
-                dir = spherical(Vec2(elevation, azimuth))
-                offset = dir * radius
-                pos = bush_pos + offset
-                leaves.append(pos)
-        print(len(leaves))
-
-        # break
-
-root = None
-leaf_octree = None
-def make_tree():
-    global root, leaf_octree
-    leaves.clear()
-    bush_positions.clear()
-    a = time.time()
-    root = Section(LENGTH, TT.MAX_WIDTH, Vec3(0.0, 0.0, 0.0), Vec2(0.0, 0.0))
-    root.tree(0, Vec2(0, None), True)
-    b = time.time()
-
-    make_leaves()
-    c = time.time()
-    
-    avg = lambda xs: sum(xs) / len(xs)
-    o = Vec3(avg([l.x for l in leaves]), avg([l.y for l in leaves]), avg([l.z for l in leaves]))
-    rad = max([max(abs(l.x - o.x), abs(l.y - o.y), abs(l.z - o.z)) for l in leaves]) + 0.1 # for good luck
-    leaf_octree = Octree(o, rad)
-    for leaf in leaves:
-        leaf_octree.add(leaf)
-    d = time.time()
-    print(f"trunk: {b-a}, leaves: {c-b}, octree: {d-c}, total: {d-a}")
-
-make_tree()
-
-def mkbuf():
-    return [[[0, 0, 0], 255, False] for i in range(resolution * resolution)]
-
-buf = mkbuf()
-
-def raycast(pos):
-    ray = Vec3(pos.x, pos.y, pos.z) + LIGHT_DIR * LEAF_RAD;
-    light = 1
-    for i in range(30):
-        col = (0, 0, 255)
-        leaves_hit = leaf_octree.query(ray)
-        if leaves_hit > 0:
-            light *= 0.98 ** leaves_hit
-            col = (255, 0, 0)
-
-        if DRAW_LINE:
-            start = (rotateX(rotateZ(ray, ang.y), ang.x).xy() + ORIGIN) * scl
-            end = (rotateX(rotateZ(ray + LIGHT_DIR, ang.y), ang.x).xy() + ORIGIN) * scl
-            pygame.draw.line(screen, col, (start.x, start.y), (end.x, end.y))
-        ray += LIGHT_DIR
-    return light
-
-def draw_leaf(leaf):
-    pos = rotateX(rotateZ(leaf, ang.y), ang.x)
-    idx = int(pos.y + ORIGIN.y) * resolution + int(pos.x + ORIGIN.x)
-    if pos.z <= buf[idx][1]:
-        light = raycast(leaf)
-        col = LEAF_COLOURS[int(light * (len(LEAF_COLOURS) - 1))]
-        buf[idx] = (col, pos.z)
-        return col
+tree = None
+skeleton = None
+trunk_cloud = None
+tree_id = 0
+tree_cache = None
+def build_tree(seed, species, progress=None):
+    # build (or load) a lit tree for seed; touches no module state, so it can run on the builder thread
+    STATS.begin_tree()
+    with STATS.phase("total", "tree"):
+        return generate_cached(tree_cache, seed, species, LENGTH, light_params(), progress=progress)
+
+def set_tree(new_tree, baked):
+    # make new_tree the one the window shows
+    global tree, skeleton, bush_positions, leaf_points, leaves, trunk_cloud, tree_id
+    tree = new_tree
+    skeleton = tree.skeleton
+    bush_positions = skeleton.bushes
+    leaf_points = tree.leaves
+    leaves = PointView(leaf_points)
+    trunk_cloud = tree.trunk
+    tree_id += 1
+    light_cache.put(lights_key(), baked)
+    return tree
+
+def make_tree(seed):
+    # blocking; the window uses builder instead once it's running
+    return set_tree(*build_tree(seed, TT))
+
+# generates trees off the main thread, the window keeps showing the old one until the new one is ready
+builder = BackgroundBuilder(build_tree)
+
+rasterizer = Rasterizer(resolution)
+# for the debug views; rasterizer has its own
+camera = Camera()
+presenter = Presenter(resolution, scl)
+# 100x100 frames are 30KB each
+frame_cache = FrameCache(256)
+# views closer than this share a cached frame; far below a pixel at this resolution
+ANGLE_STEP = 0.001
+
+def light_params():
+    return (LIGHT_DIR.tup(), LEAF_RAD, LEAF_TRANSMITTANCE, LIGHT_VOXEL)
+
+def bake_lighting(tree):
+    return tree.bake(*light_params())
+
+light_cache = LightCache(lambda: bake_lighting(tree))
+
+def lights_key():
+    # anything the bake depends on goes in the key, so a new tree or light direction rebakes on the next frame. Not TT:
+    # that changes as soon as a new species is requested, while the current tree is still the old one
+    return (tree_id, LIGHT_DIR.tup())
+
+def lights():
+    return light_cache.get(lights_key())
+
+def palette_colours(palette, light):
+    index = np.minimum(len(palette) - 1, (light / LIGHT_WHITE * (len(palette) - 1)).astype(np.int64))
+    return np.array(palette, dtype=np.uint8)[index]
+
+def tree_geometry(tree, baked):
+    return Geometry(tree.trunk, palette_colours(TRUNK_COLOURS, baked.trunk), tree.leaves, palette_colours(LEAF_COLOURS, baked.leaves), tree.zoom)
+
+def geometry():
+    return tree_geometry(tree, lights())
+
+def frame_key():
+    # everything a frame depends on: tree and lighting, view angle and draw mode
+    return (lights_key(), round(ang.x / ANGLE_STEP), round(ang.y / ANGLE_STEP), DRAW_PX, DRAW_LINE, debug_leaves)
+
+def render(rasterizer, ang, origin):
+    # the current tree into rasterizer's buffers, as seen from ang
+    with STATS.phase("lighting"):
+        geom = geometry()
+    with STATS.phase("raster"):
+        raster.render(rasterizer, geom, ang, origin)
+
+show_stats = False
+overlay_font = None
+def draw_text(line, pos):
+    global overlay_font
+    if overlay_font is None:
+        overlay_font = pygame.font.Font(None, 20)
+    screen.blit(overlay_font.render(line, True, (255, 255, 255), (0, 0, 0)), pos)
+
+def draw_stats():
+    # overlay of the last frame's and tree's timings and the running counters
+    for i, line in enumerate(STATS.lines()):
+        draw_text(line, (4, 4 + i * 16))
+
+def draw_progress():
+    # phase name and a bar along the bottom while the next tree is being built
+    phase, fraction = builder.progress
+    pygame.draw.rect(screen, (80, 80, 80), (0, h - 6, w, 6))
+    pygame.draw.rect(screen, (255, 255, 255), (0, h - 6, int(w * fraction), 6))
+    draw_text(f"generating: {phase}", (4, h - 24))
+
+def draw_lines(ang):
+    # debug view: every section as a line, trunk cyan and branches red, darker further away
+    camera.look(ang)
+    start = camera.project(skeleton.pos)
+    end = camera.project(skeleton.end_pos())
+    for start_pos, end_pos, is_trunk in zip(start.tolist(), end.tolist(), skeleton.is_trunk.tolist()):
+        hue = 0.5 if is_trunk else 0.0
+        value = (-end_pos[2] + 30) / 60
+        if value > 1: value = 1
+        if value < 0: value = 0
+        r, g, b = colorsys.hsv_to_rgb(hue, 1, value)
+        col = (int(r*255), int(g*255), int(b*255))
+        pygame.draw.line(screen, col, ((start_pos[0] + ORIGIN.x) * scl, (start_pos[1] + ORIGIN.y) * scl), ((end_pos[0] + ORIGIN.x) * scl, (end_pos[1] + ORIGIN.y) * scl))
 
 frame_number = 0
 def loop():
-    global buf
     global frame_number
+    STATS.begin_frame()
     screen.fill((0, 0, 0))
-    buf = mkbuf()
-    root.draw(ang)
+    if DRAW_LINE:
+        with STATS.phase("lines"):
+            draw_lines(ang)
 
     if DRAW_PX:
-        for leaf in leaves:
-            pos = rotateX(rotateZ(leaf, ang.y), ang.x)
-            idx = int(pos.y + ORIGIN.y) * resolution + int(pos.x + ORIGIN.x)
-            if pos.z < buf[idx][1]:
-                buf[idx] = (leaf, pos.z)
-    else:
-        pass
-        # leaf = leaves[sel_leaf]
-        # draw_leaf(leaf)
-    
-    if DRAW_PX:
-        # offset = int(w * (scl/8 - 1) / 2)
-        for x in range(resolution):
-            for y in range(resolution):
-                val = buf[y * resolution + x]
-                if val[1] != 255:
-                    # if val[0] is None:
-                    #     hue = 0
-                    #     saturation = 0
-                    # else:
-                    #     hue = val[0] / 360
-                    #     if hue > 1: hue = 1
-                    #     if hue < 0: hue = 0
-                    #     saturation = 1
-
-                    # value = (-val[1] + 20) / 40
-                    # if value > 1: value = 1
-                    # if value < 0: value = 0
-                    
-                    # r, g, b = colorsys.hsv_to_rgb(hue, saturation, value)
-                    # fill(int(r*255),int(g*255),int(b*255))
-                    if type(val[0]) == Vec3:
-                        col = draw_leaf(val[0])
-                    else:
-                        col = val[0]
-                    r, g, b = col
-                    if g > 255:
-                        g = 255
-                    if g < 0:
-                        g = 0
-                    
-                    z = val[1]
-                    # factor = (-z + 20) / 40
-                    # if factor < 0:
-                    #     factor = 0
-                    # if factor > 1:
-                    #     factor = 1
-                    factor = 1
-                    col = (int(r*factor), int(g*factor), int(b*factor))
-                    pygame.draw.rect(screen, col, (x * scl, y * scl - scl/2, round(scl), round(scl)))
+        key = frame_key()
+        colour = frame_cache.get(key)
+        if colour is None:
+            render(rasterizer, ang, ORIGIN)
+            colour = frame_cache.put(key, rasterizer.colour.copy())
+        else:
+            STATS.count("frame cache hits")
+        with STATS.phase("present"):
+            presenter.present(screen, colour)
         # pygame.image.save(screen, f"frame{frame_number:04d}.png")
         frame_number += 1
     elif debug_leaves:
-        # leaf_octree.draw()
-        for leaf in leaves:
-            pos = rotateX(rotateZ(leaf, ang.y), ang.x)
+        for x, y, z in camera.look(ang).project(leaf_points).tolist():
+            pos = Vec3(x, y, z)
 
             hue = 0.3
             value = (-pos.z + 30) / 60
@@ -743,6 +405,10 @@ def loop():
             pos = pos.xy() + ORIGIN
             idx = int(pos.y) * resolution + int(pos.x)
             pygame.draw.circle(screen, col, (pos.x * scl, pos.y * scl), LEAF_RAD)
+    if show_stats:
+        draw_stats()
+    if builder.progress:
+        draw_progress()
     pygame.display.flip()
     # ang.y += 0.08
 
@@ -751,15 +417,13 @@ sel_leaf = 1
 last_seed = 1720987585756419465
 
 def on_mouse_button_down(e):
-    global root
     global scl
     global sel_leaf, last_seed
     if e.button == 1:
         seed = time.time_ns()
         print(seed)
         last_seed = seed
-        random.seed(seed)
-        make_tree()
+        builder.request(seed, TT)
     elif e.button == 5:
         sel_leaf += 1
     elif e.button == 4:
@@ -774,7 +438,7 @@ def on_mouse_motion(e):
 import pygame
 def on_keydown(e):
     global DRAW_PX
-    global DRAW_LINE, correct, TT, debug_leaves
+    global DRAW_LINE, correct, TT, debug_leaves, show_stats
     if e.key == pygame.K_t:
         if DRAW_PX:
             DRAW_PX = False
@@ -784,43 +448,66 @@ def on_keydown(e):
             DRAW_LINE = False
     if e.key == pygame.K_e:
         correct = not correct
-        random.seed(last_seed)
         TT = Poplar if correct else Oak
-        make_tree()
+        builder.request(last_seed, TT)
         print(correct)
 
     if e.key == pygame.K_l:
         debug_leaves = not debug_leaves
+
+    if e.key == pygame.K_i and STATS.enabled:
+        show_stats = not show_stats
         
 
 def main():
-    total = 0
+    global screen, tree_cache, show_stats
+    # --stats (or TREEGEN_STATS=1) turns on timings and counters, shown as an overlay toggled with i
+    if "--stats" in sys.argv:
+        STATS.enabled = True
+    show_stats = STATS.enabled
+    pygame.init()
+    screen = pygame.display.set_mode((w, h))
+    # TREEGEN_CACHE picks where generated trees are kept between runs; set it empty to turn the cache off
+    cache_dir = os.environ.get("TREEGEN_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pixel-art-tree-gen"))
+    if cache_dir:
+        tree_cache = TreeCache(cache_dir)
+    make_tree(last_seed)
+
     # for i in range(50):
     # init_hue = 0.5
     # global LEAF_COLOURS
+    drawn = None
     while True:
         try:
-            for event in pygame.event.get():
+            # nothing changed since the last frame, so sleep until an event arrives instead of redrawing
+            events = pygame.event.get()
+            if not events and drawn == (frame_key(), show_stats, builder.progress):
+                events = [pygame.event.wait()]
+            for event in events:
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     on_mouse_button_down(event)
                 elif event.type == pygame.MOUSEMOTION:
                     on_mouse_motion(event)
                 elif event.type == pygame.KEYDOWN:
                     on_keydown(event)
+                elif event.type == TREE_READY:
+                    if builder.current(event):
+                        set_tree(*event.result)
+                elif event.type == pygame.WINDOWEXPOSED:
+                    drawn = None
                 elif event.type == pygame.QUIT:
                     return
-            a = time.time()
-            loop()
-            b = time.time()
-            rate = 1/(b-a)
-            total += rate
+            # TREE_PROGRESS events need no handling, they just change builder.progress and so get a redraw
+            if drawn != (frame_key(), show_stats, builder.progress):
+                with STATS.phase("total"):
+                    loop()
+                drawn = (frame_key(), show_stats, builder.progress)
 
             # init_hue += 0.01
             # LEAF_COLOURS = generate_palette(init_hue)
         except Exception as e:
             print(traceback.format_exc())
             break
-    print(total / 50)
 
 if __name__ == "__main__":
     main()
@@ -3,24 +3,7 @@ sys.path.append("..")
 from pyrocessing import *
 from math import *
 import random
-
-class Vec2:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-    def __add__(self, other):
-        if type(other) == type(self):
-            return Vec2(self.x + other.x, self.y + other.y)
-        else:
-            raise TypeError(f"Can't add type '{type(other)}' to Vec2")
-
-    def __mul__(self, other):
-        if not type(other) == int or type(other) == float:
-            raise TypeError(f"Can't multiply type '{type(other)}' with Vec2")
-        return Vec2(self.x * other, self.y * other)
-    def __repr__(self):
-        return f"Vec2({self.x}, {self.y})"
+from vec import Vec2
 
 class Section:
     def __init__(self, length, width, pos, angle, children):
@@ -96,7 +79,6 @@ class Section:
         for n in range(0, int(self.length)):
             end_pos = Vec2(cos(self.angle), sin(self.angle)) * n + self.pos
             actual_width = round(self.width / 16 * 3) + 1
-            print(actual_width)
             for dx in range(actual_width):
                 for dy in range(actual_width):
                     rect(int(end_pos.x + dx) * scl, int(end_pos.y + dy) * scl, scl, scl)
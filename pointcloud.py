@@ -0,0 +1,115 @@
+"""Stream a tree straight into a binary PLY point cloud, piece by piece, without ever holding the whole tree.
+
+    python pointcloud.py 1720987585756419465 --zoom 8 --out tree.ply --preview tree.png
+
+Trunk samples are brown and leaves green; there's no lighting, since that
+needs every leaf at once. --preview also draws the pieces, unlit, into a
+rasterizer as they arrive.
+"""
+import argparse, time
+from contextlib import nullcontext
+from math import pi
+from multiprocessing import Pool
+
+import numpy as np
+import pygame
+
+import main
+from main import Vec2
+from raster import Rasterizer, trunk_pixels
+from render import to_surface
+from tree import TreeGenerator
+
+TRUNK_COLOUR = (110, 80, 50)
+LEAF_COLOUR = (90, 150, 60)
+VERTEX = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"), ("red", "u1"), ("green", "u1"), ("blue", "u1")])
+
+class PLYWriter:
+    """Binary little-endian PLY of coloured points, written as they come; the point count is filled in on close."""
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.count = 0
+        self.file.write(b"ply\nformat binary_little_endian 1.0\nelement vertex ")
+        self.count_at = self.file.tell()
+        # zero padded, so the real count fits in the same bytes later
+        self.file.write(b"0" * 12 + b"\n")
+        for name, kind in (("x", "float"), ("y", "float"), ("z", "float"), ("red", "uchar"), ("green", "uchar"), ("blue", "uchar")):
+            self.file.write(f"property {kind} {name}\n".encode())
+        self.file.write(b"end_header\n")
+
+    def write(self, points, colour):
+        vertices = np.empty(len(points), dtype=VERTEX)
+        vertices["x"], vertices["y"], vertices["z"] = points[:, 0], points[:, 1], points[:, 2]
+        vertices["red"], vertices["green"], vertices["blue"] = colour
+        self.file.write(vertices.tobytes())
+        self.count += len(points)
+
+    def close(self):
+        self.file.seek(self.count_at)
+        self.file.write(f"{self.count:012d}".encode())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # the header stays valid for the points written so far, even if streaming failed
+        self.close()
+
+class StreamPreview:
+    """Depth-tests streamed pieces into a rasterizer in flat colours, as they arrive."""
+    def __init__(self, resolution, zoom, ang):
+        self.rasterizer = Rasterizer(resolution)
+        self.camera = self.rasterizer.camera.look(ang)
+        self.origin = Vec2(resolution//2, resolution//4*3)
+        self.zoom = zoom
+        self.next_id = 0
+
+    def draw(self, kind, piece):
+        if kind == "trunk":
+            xs, ys, zs, samples = trunk_pixels(piece, self.camera, self.origin, self.zoom)
+            colours = np.broadcast_to(np.array(TRUNK_COLOUR, dtype=np.uint8), (len(piece.pos), 3))
+            self.rasterizer.draw(xs, ys, zs, colours[samples], self.next_id + samples)
+            self.next_id += len(piece.pos)
+        elif kind == "leaves":
+            pos = self.camera.project(piece)
+            pos[:, :2] *= self.zoom
+            xs = (pos[:, 0] + self.origin.x).astype(np.int64)
+            ys = (pos[:, 1] + self.origin.y).astype(np.int64)
+            colours = np.broadcast_to(np.array(LEAF_COLOUR, dtype=np.uint8), (len(piece), 3))
+            self.rasterizer.draw(xs, ys, pos[:, 2], colours, self.next_id + np.arange(len(piece)))
+            self.next_id += len(piece)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Stream a tree into a PLY point cloud.")
+    parser.add_argument("seed", type=int)
+    parser.add_argument("--species", choices=["Oak", "Poplar"], default="Poplar")
+    parser.add_argument("--zoom", type=float, default=1.0, help="sampling density, as for a render at zoom x 100px")
+    parser.add_argument("--sections", type=int, default=256, help="sections per streamed batch")
+    parser.add_argument("--leaves", type=int, default=65536, help="leaf points per streamed chunk")
+    parser.add_argument("--out", default="tree.ply")
+    parser.add_argument("--preview", metavar="PNG", help="also draw the pieces, unlit, into PNG")
+    parser.add_argument("--jobs", type=int, default=1, help="processes generating leaves; the points are the same for any number")
+    args = parser.parse_args()
+
+    start = time.time()
+    preview = StreamPreview(int(main.resolution * args.zoom), args.zoom, Vec2(pi/2, 0)) if args.preview else None
+    largest = 0
+    # leaving the with block terminates the workers, whether or not streaming finished
+    with Pool(args.jobs) if args.jobs > 1 else nullcontext() as pool, PLYWriter(args.out) as writer:
+        generator = TreeGenerator(args.seed, getattr(main, args.species), main.LENGTH, args.zoom, pool)
+        for kind, piece in generator.stream(args.sections, args.leaves):
+            if kind == "trunk":
+                writer.write(piece.pos, TRUNK_COLOUR)
+            elif kind == "leaves":
+                writer.write(piece, LEAF_COLOUR)
+                largest = max(largest, len(piece))
+            if preview:
+                preview.draw(kind, piece)
+    if preview:
+        r = preview.rasterizer
+        pygame.image.save(to_surface(r.colour, r.source != Rasterizer.EMPTY), args.preview)
+    print(f"{writer.count} points in {time.time() - start:.2f}s, largest leaf chunk {largest} points -> {args.out}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,44 @@
+import pygame
+from collections import OrderedDict
+
+class Presenter:
+    """Puts a rasterizer's colour buffer on screen: one array blit into a buffer-sized surface, then one scaled blit.
+
+    Only plain surfaces are involved (no convert()), so it works the same
+    with SDL_VIDEODRIVER=dummy.
+    """
+    def __init__(self, resolution, scl):
+        self.scl = scl
+        self.small = pygame.Surface((resolution, resolution))
+        self.scaled = pygame.Surface((resolution * scl, resolution * scl))
+
+    def present(self, target, colour):
+        # surfarray indexes (x, y), the buffers are (y, x)
+        pygame.surfarray.blit_array(self.small, colour.swapaxes(0, 1))
+        pygame.transform.scale(self.small, self.scaled.get_size(), self.scaled)
+        # pixels have always been drawn half a pixel up
+        target.blit(self.scaled, (0, -(self.scl // 2)))
+
+class FrameCache:
+    """Finished frames (colour buffers) by view key, dropping the least recently used beyond size entries."""
+    def __init__(self, size):
+        self.size = size
+        self.frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        frame = self.frames.get(key)
+        if frame is None:
+            self.misses += 1
+            return None
+        self.frames.move_to_end(key)
+        self.hits += 1
+        return frame
+
+    def put(self, key, frame):
+        self.frames[key] = frame
+        self.frames.move_to_end(key)
+        while len(self.frames) > self.size:
+            self.frames.popitem(last=False)
+        return frame
@@ -0,0 +1,103 @@
+import numpy as np
+from collections import namedtuple
+
+from camera import Camera
+from stats import STATS
+
+# flat trunk geometry: one entry per pixel sample along every section, in draw order
+TrunkCloud = namedtuple("TrunkCloud", ["pos", "width", "is_trunk"])
+
+# everything view-independent needed to draw a lit tree: the trunk cloud and leaf points, with their baked colours,
+# and the pixels per world unit it was sampled for
+Geometry = namedtuple("Geometry", ["trunk", "trunk_colours", "leaves", "leaf_colours", "zoom"], defaults=[1.0])
+
+def trunk_pixels(cloud, camera, origin, zoom=1.0):
+    """Screen pixels covered by the trunk from this view, as (x, y, depth, sample index) arrays.
+
+    Each sample is drawn as a horizontal run of its width (in pixels),
+    centred on the projected sample.
+    """
+    ss = camera.project(cloud.pos)
+    if zoom != 1:
+        ss[:, :2] *= zoom
+    sample = np.repeat(np.arange(len(cloud.width)), cloud.width)
+    # position of each pixel within its sample's run
+    dx = np.arange(len(sample)) - np.repeat(np.cumsum(cloud.width) - cloud.width, cloud.width)
+    half = cloud.width[sample] / 2
+    x = (ss[sample, 0] + dx - half).astype(np.int64) + origin.x
+    y = (ss[sample, 1] - half).astype(np.int64) + origin.y
+    return x, y, ss[sample, 2], sample
+
+class Rasterizer:
+    """Z-buffer with depth, colour and source id buffers, allocated once and reused between frames.
+
+    Source ids are whatever the caller passes per point (e.g. leaf or trunk
+    sample index); empty pixels have id EMPTY and infinite depth.
+    """
+    EMPTY = -1
+
+    def __init__(self, resolution):
+        self.resolution = resolution
+        # kept between frames so an unchanged view doesn't rebuild its matrices
+        self.camera = Camera()
+        self.depth = np.full((resolution, resolution), np.inf)
+        self.colour = np.zeros((resolution, resolution, 3), dtype=np.uint8)
+        self.source = np.full((resolution, resolution), self.EMPTY, dtype=np.int64)
+
+    def clear(self):
+        self.depth.fill(np.inf)
+        self.colour.fill(0)
+        self.source.fill(self.EMPTY)
+
+    def draw(self, x, y, z, colour, source):
+        """Depth-test points into the buffers, closest wins.
+
+        x and y are integer pixel coordinates, colour is (N, 3). Points off
+        the buffer are dropped. As with sequential drawing, a point only
+        replaces a strictly further one, so earlier points win depth ties.
+        """
+        res = self.resolution
+        inside = (x >= 0) & (x < res) & (y >= 0) & (y < res)
+        pixel = (y * res + x)[inside]
+        z = np.asarray(z)[inside]
+        index = np.flatnonzero(inside)
+        if len(pixel) == 0:
+            return
+
+        # group points by pixel, nearest first; lexsort is stable so draw order breaks ties
+        order = np.lexsort((z, pixel))
+        pixel = pixel[order]
+        first = np.ones(len(pixel), dtype=bool)
+        first[1:] = pixel[1:] != pixel[:-1]
+        pixel = pixel[first]
+        order = order[first]
+        z = z[order]
+
+        closer = z < self.depth.ravel()[pixel]
+        pixel = pixel[closer]
+        chosen = index[order[closer]]
+        self.depth.ravel()[pixel] = z[closer]
+        self.colour.reshape(-1, 3)[pixel] = np.asarray(colour)[chosen]
+        self.source.ravel()[pixel] = np.asarray(source)[chosen]
+        STATS.count("pixels written", len(pixel))
+
+def render(rasterizer, geometry, ang, origin):
+    """Draw a tree's geometry into rasterizer's (cleared) buffers as seen from ang.
+
+    Source ids are trunk samples first, then leaves.
+    """
+    rasterizer.clear()
+    draw_geometry(rasterizer, geometry, rasterizer.camera.look(ang), origin)
+
+def draw_geometry(rasterizer, geometry, camera, origin, first_id=0):
+    """Depth-test geometry into rasterizer over whatever is already there. Source ids start at first_id."""
+    xs, ys, zs, samples = trunk_pixels(geometry.trunk, camera, origin, geometry.zoom)
+    rasterizer.draw(xs, ys, zs, geometry.trunk_colours[samples], first_id + samples)
+
+    pos = camera.project(geometry.leaves)
+    if geometry.zoom != 1:
+        pos[:, :2] *= geometry.zoom
+    xs = (pos[:, 0] + origin.x).astype(np.int64)
+    ys = (pos[:, 1] + origin.y).astype(np.int64)
+    ids = first_id + len(geometry.trunk.pos) + np.arange(len(geometry.leaves))
+    rasterizer.draw(xs, ys, pos[:, 2], geometry.leaf_colours, ids)
@@ -0,0 +1,87 @@
+"""Render trees to PNG without opening a window, one process per core.
+
+    python render.py 1 2 3 100-199 --species Oak --resolution 128 --out trees
+"""
+import argparse, os, time
+from math import pi
+from multiprocessing import Pool
+
+import pygame
+
+import main
+from main import Vec2
+from raster import Rasterizer, render
+from cache import TreeCache, generate_cached
+
+def parse_seeds(tokens):
+    # "N" or an inclusive range "A-B"
+    seeds = []
+    for token in tokens:
+        if "-" in token.lstrip("-"):
+            start, stop = token.split("-", 1)
+            seeds.extend(range(int(start), int(stop) + 1))
+        else:
+            seeds.append(int(token))
+    return seeds
+
+def render_tree(seed, species, resolution, ang, cache=None):
+    """Generate (or load from cache) the tree for seed and return its (colour, mask) buffers as seen from ang.
+
+    The tree is scaled to fill resolution as it fills the window's, and sampled to match.
+    """
+    zoom = resolution / main.resolution
+    tree, baked = generate_cached(cache, seed, getattr(main, species), main.LENGTH, main.light_params(), zoom)
+    geometry = main.tree_geometry(tree, baked)
+    rasterizer = Rasterizer(resolution)
+    render(rasterizer, geometry, ang, Vec2(resolution//2, resolution//4*3))
+    return rasterizer.colour, rasterizer.source != Rasterizer.EMPTY
+
+def to_surface(colour, mask, scale=1):
+    # RGBA surface with the background left transparent
+    height, width = mask.shape
+    surface = pygame.Surface((width, height), pygame.SRCALPHA)
+    pygame.surfarray.blit_array(surface, colour.swapaxes(0, 1))
+    alpha = pygame.surfarray.pixels_alpha(surface)
+    alpha[:] = mask.T * 255
+    del alpha
+    if scale != 1:
+        surface = pygame.transform.scale(surface, (width * scale, height * scale))
+    return surface
+
+def _render_job(job):
+    seed, args = job
+    cache = TreeCache(args.cache) if args.cache else None
+    colour, mask = render_tree(seed, args.species, args.resolution, Vec2(args.pitch, args.yaw), cache)
+    path = os.path.join(args.out, f"{args.species.lower()}_{seed}.png")
+    pygame.image.save(to_surface(colour, mask, args.scale), path)
+    return path, cache and cache.hits
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Render trees to PNG without a window.")
+    parser.add_argument("seeds", nargs="+", help="seeds, or inclusive ranges like 100-199")
+    parser.add_argument("--species", choices=["Oak", "Poplar"], default="Poplar")
+    parser.add_argument("--resolution", type=int, default=main.resolution)
+    parser.add_argument("--pitch", type=float, default=pi/2, help="view angle about x (ang.x)")
+    parser.add_argument("--yaw", type=float, default=0.0, help="view angle about z (ang.y)")
+    parser.add_argument("--scale", type=int, default=1, help="integer upscale of the saved image")
+    parser.add_argument("--out", default="renders")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--cache", metavar="DIR", help="keep generated trees in DIR and reuse them")
+    args = parser.parse_args()
+
+    seeds = parse_seeds(args.seeds)
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.time()
+    hits = 0
+    with Pool(args.jobs) as pool:
+        for path, hit in pool.imap_unordered(_render_job, [(seed, args) for seed in seeds]):
+            print(path)
+            hits += bool(hit)
+    elapsed = time.time() - start
+    print(f"{len(seeds)} trees in {elapsed:.2f}s ({len(seeds) / elapsed:.2f} trees/s)")
+    if args.cache:
+        print(f"cache: {hits} hits, {len(seeds) - hits} misses")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,177 @@
+"""Many trees placed in one world, lit together so they shade each other, and drawn together.
+
+    python scene.py --trees 24 --size 160 --out forest.png
+"""
+import argparse, random, time
+from math import ceil, cos, pi, sin
+
+import numpy as np
+import pygame
+
+import main
+from main import Vec2
+from camera import Camera
+from lighting import BakedLight, raycast_many
+from raster import Geometry, Rasterizer, TrunkCloud, draw_geometry
+from render import to_surface
+from spatial import BVH
+from tree import TreeGenerator
+
+class Instance:
+    """A placed tree: turned by yaw about its own z axis, then moved to position."""
+    def __init__(self, tree, position, yaw=0.0):
+        self.tree = tree
+        self.position = np.asarray(position, dtype=np.float64)
+        self.yaw = yaw
+        cosa, sina = cos(yaw), sin(yaw)
+        self.rotation = np.array([[cosa, -sina, 0], [sina, cosa, 0], [0, 0, 1]])
+        self.leaves = self.to_world(tree.leaves)
+        self.trunk = TrunkCloud(self.to_world(tree.trunk.pos), tree.trunk.width, tree.trunk.is_trunk)
+        points = np.concatenate((self.leaves, self.trunk.pos))
+        if len(points) == 0:
+            # nothing to draw or shade with; an empty box where it stands keeps it in the BVH harmlessly
+            points = self.position[None, :]
+        self.lo = points.min(axis=0)
+        self.hi = points.max(axis=0)
+
+    def to_world(self, points):
+        return np.asarray(points, dtype=np.float64).reshape(-1, 3) @ self.rotation.T + self.position
+
+    def to_local(self, points):
+        return (points - self.position) @ self.rotation
+
+    def __len__(self):
+        # source ids it takes up when drawn
+        return len(self.trunk.pos) + len(self.leaves)
+
+class Scene:
+    """Tree instances with a BVH over their world bounds.
+
+    Lighting marches each instance's rays only through the instances whose
+    bounds the rays' swept box overlaps (itself included), so neighbours
+    shade each other. Drawing skips instances whose projected bounds miss
+    the raster. Both cost about the number of trees involved, not the total.
+    """
+    def __init__(self, instances):
+        self.instances = list(instances)
+        self.bvh = BVH([i.lo for i in self.instances], [i.hi for i in self.instances])
+        self.zoom = self.instances[0].tree.zoom if self.instances else 1.0
+        if any(i.tree.zoom != self.zoom for i in self.instances):
+            raise ValueError("all trees in a scene must be generated at the same zoom")
+        # each instance's source ids start here
+        self.first_ids = np.cumsum([0] + [len(i) for i in self.instances])[:-1].tolist()
+
+    def light(self, origins, light_dir, radius, transmittance, voxel=None, steps=30):
+        """Light reaching each world-space origin through every instance's leaves."""
+        light = np.ones(len(origins))
+        if len(origins) == 0:
+            return light
+        # each ray counts leaves within radius of points from origin + light_dir*radius, steps - 1 units on
+        first = origins + light_dir * radius
+        last = first + light_dir * (steps - 1)
+        ray_lo = np.minimum(first, last) - radius
+        ray_hi = np.maximum(first, last) + radius
+        for j in self.bvh.overlapping(ray_lo.min(axis=0), ray_hi.max(axis=0)):
+            other = self.instances[j]
+            hit = np.all(ray_lo <= other.hi, axis=1) & np.all(ray_hi >= other.lo, axis=1)
+            if not hit.any():
+                continue
+            # march in the other tree's own frame, where its index lives
+            light[hit] *= raycast_many(
+                other.to_local(origins[hit]), other.tree.occluders(radius, voxel), light_dir @ other.rotation,
+                radius, other.tree.leaf_transmittance(transmittance), steps,
+            )
+        return light
+
+    def bake(self, light_dir, radius, transmittance, voxel=None):
+        """A BakedLight per instance, in instance order."""
+        light_dir = np.asarray(light_dir, dtype=np.float64)
+        light = lambda origins: self.light(origins, light_dir, radius, transmittance, voxel)
+        return [BakedLight(light(i.leaves), light(i.trunk.pos)) for i in self.instances]
+
+    def geometries(self, baked, colourise):
+        """World-space Geometry per instance; colourise(tree, baked) gives a tree's local Geometry (main.tree_geometry does)."""
+        geometries = []
+        for instance, light in zip(self.instances, baked):
+            local = colourise(instance.tree, light)
+            geometries.append(Geometry(instance.trunk, local.trunk_colours, instance.leaves, local.leaf_colours, local.zoom))
+        return geometries
+
+    def visible(self, camera, origin, resolution):
+        """Ids of the instances whose bounds land on a resolution-sized raster."""
+        # trunk runs spread sideways past their sample, by at most this many pixels
+        pad = 4 * self.zoom
+
+        def on_screen(lo, hi):
+            corners = np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+            ss = camera.project(corners)[:, :2] * self.zoom + origin.tup()
+            return bool(np.all(ss.min(axis=0) - pad < resolution) and np.all(ss.max(axis=0) + pad >= 0))
+
+        return self.bvh.find(on_screen)
+
+    def render(self, rasterizer, geometries, ang, origin):
+        """Draw every visible instance into rasterizer's (cleared) buffers; returns the ids drawn."""
+        rasterizer.clear()
+        camera = rasterizer.camera.look(ang)
+        visible = self.visible(camera, origin, rasterizer.resolution)
+        for i in visible:
+            draw_geometry(rasterizer, geometries[i], camera, origin, self.first_ids[i])
+        return visible
+
+    def screen_bounds(self, ang):
+        """(min, max) screen xy of every instance's bounds with the world origin at (0, 0)."""
+        camera = Camera(ang)
+        corners = np.concatenate([
+            [[x, y, z] for x in (i.lo[0], i.hi[0]) for y in (i.lo[1], i.hi[1]) for z in (i.lo[2], i.hi[2])]
+            for i in self.instances
+        ])
+        ss = camera.project(corners)[:, :2] * self.zoom
+        return ss.min(axis=0), ss.max(axis=0)
+
+def scatter(count, size, rng):
+    """count (x, y) positions over a size x size tile: a jittered grid, so trees neither stack up nor line up."""
+    per_row = ceil(count ** 0.5)
+    cell = size / per_row
+    return [((n % per_row + rng.uniform(0.2, 0.8)) * cell - size / 2, (n // per_row + rng.uniform(0.2, 0.8)) * cell - size / 2)
+            for n in range(count)]
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Render a tile of trees that shade each other.")
+    parser.add_argument("--trees", type=int, default=24)
+    parser.add_argument("--size", type=float, default=160, help="tile width in world units")
+    parser.add_argument("--seed", type=int, default=1, help="picks the trees, their placement and species")
+    parser.add_argument("--species", choices=["Oak", "Poplar", "mixed"], default="mixed")
+    parser.add_argument("--pitch", type=float, default=2.0)
+    parser.add_argument("--yaw", type=float, default=0.3)
+    parser.add_argument("--zoom", type=float, default=1.0)
+    parser.add_argument("--scale", type=int, default=4, help="integer upscale of the saved image")
+    parser.add_argument("--out", default="forest.png")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.time()
+    instances = []
+    for x, y in scatter(args.trees, args.size, rng):
+        species = rng.choice(["Oak", "Poplar"]) if args.species == "mixed" else args.species
+        tree = TreeGenerator(rng.getrandbits(64), getattr(main, species), main.LENGTH, args.zoom).generate()
+        instances.append(Instance(tree, (x, y, 0), rng.uniform(0, 2*pi)))
+    scene = Scene(instances)
+    generated = time.time()
+
+    baked = scene.bake(*main.light_params())
+    lit = time.time()
+
+    ang = Vec2(args.pitch, args.yaw)
+    lo, hi = scene.screen_bounds(ang)
+    margin = 2
+    resolution = int(ceil((hi - lo).max())) + 2 * margin
+    origin = Vec2(int(-lo[0]) + margin, int(-lo[1]) + margin)
+    rasterizer = Rasterizer(resolution)
+    drawn = scene.render(rasterizer, scene.geometries(baked, main.tree_geometry), ang, origin)
+    pygame.image.save(to_surface(rasterizer.colour, rasterizer.source != Rasterizer.EMPTY, args.scale), args.out)
+    done = time.time()
+    print(f"{len(instances)} trees: generated in {generated - start:.2f}s, lit in {lit - generated:.2f}s, "
+          f"{len(drawn)} drawn at {resolution}px in {done - lit:.2f}s -> {args.out}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,270 @@
+import numpy as np
+from math import pi, sin, cos, log
+
+class Skeleton:
+    """A tree's sections as parallel arrays, in depth-first order (parents before children).
+
+    pos and angles are each section's start and (elevation, azimuth);
+    parent is -1 for the root. bushes holds the start of every section
+    too thin to carry on, where the leaves go.
+    """
+    def __init__(self, length, pos, angles, width, parent, is_trunk, inarow, bushes):
+        self.length = length
+        self.pos = pos
+        self.angles = angles
+        self.width = width
+        self.parent = parent
+        self.is_trunk = is_trunk
+        self.inarow = inarow
+        self.bushes = bushes
+
+    def __len__(self):
+        return len(self.width)
+
+    def directions(self):
+        return np.stack((
+            np.sin(self.angles[:, 0]) * np.cos(self.angles[:, 1]),
+            np.sin(self.angles[:, 0]) * np.sin(self.angles[:, 1]),
+            np.cos(self.angles[:, 0]),
+        ), axis=1)
+
+    def end_pos(self):
+        return self.directions() * self.length + self.pos
+
+    def depths(self):
+        # sections from the root to each section; parents come first, so one pass fills them in
+        depth = np.zeros(len(self), dtype=np.int64)
+        for i, p in enumerate(self.parent.tolist()):
+            if p >= 0:
+                depth[i] = depth[p] + 1
+        return depth
+
+    def node(self, i):
+        """Object view of section i, for poking around in a debugger."""
+        return Node(self, i)
+
+class Node:
+    def __init__(self, skeleton, index):
+        self.skeleton = skeleton
+        self.index = index
+
+    def __getattr__(self, name):
+        if name in ("pos", "angles", "width", "is_trunk", "inarow"):
+            value = getattr(self.skeleton, name)[self.index]
+            return tuple(value.tolist()) if value.ndim else value.item()
+        raise AttributeError(name)
+
+    @property
+    def parent(self):
+        p = int(self.skeleton.parent[self.index])
+        return None if p < 0 else Node(self.skeleton, p)
+
+    @property
+    def children(self):
+        return [Node(self.skeleton, int(i)) for i in np.flatnonzero(self.skeleton.parent == self.index)]
+
+    def __repr__(self):
+        return f"Node({self.index}, pos={self.pos}, width={self.width})"
+
+def spherical(angles):
+    return (
+        sin(angles[0]) * cos(angles[1]),
+        sin(angles[0]) * sin(angles[1]),
+        cos(angles[0]),
+    )
+
+def build_skeleton(species, rng, length):
+    """Grow a tree of species, drawing every random number from rng.
+
+    Works off an explicit stack rather than recursing, so tree size is not
+    bounded by the recursion limit. Sections are visited in the same order
+    (and draw from rng in the same order) as the recursive generator did.
+    """
+    return concat_skeletons(list(iter_skeleton(species, rng, length)), length)
+
+def iter_skeleton(species, rng, length, batch_size=256):
+    """build_skeleton in pieces: a Skeleton of the next batch_size sections (fewer for the last) as soon as they're grown.
+
+    Parent indices are into the whole tree, and each batch's bushes are the
+    ones found among its sections. Only the growth stack is kept between
+    batches.
+    """
+    TT = species
+    offset = 0
+    pos, angles, width, parent, is_trunk, inarow, bushes = [], [], [], [], [], [], []
+
+    # (start, angles, width, parent, inarow, bias, is_trunk); bias azimuth may be None
+    stack = [((0.0, 0.0, 0.0), (0.0, 0.0), TT.MAX_WIDTH, -1, 0, (0, None), True)]
+    while stack:
+        if len(width) == batch_size:
+            yield make_skeleton(length, pos, angles, width, parent, is_trunk, inarow, bushes)
+            offset += len(width)
+            pos, angles, width, parent, is_trunk, inarow, bushes = [], [], [], [], [], [], []
+
+        section_pos, section_angles, section_width, section_parent, section_inarow, bias, section_is_trunk = stack.pop()
+        index = offset + len(width)
+        pos.append(section_pos)
+        angles.append(section_angles)
+        width.append(section_width)
+        parent.append(section_parent)
+        is_trunk.append(section_is_trunk)
+        inarow.append(section_inarow)
+
+        if section_width < 1:
+            bushes.append(section_pos)
+            continue
+
+        children = grow(TT, rng, section_angles, section_width, section_inarow, bias, section_is_trunk)
+        direction = spherical(section_angles)
+        end_pos = tuple(d * length + p for d, p in zip(direction, section_pos))
+        # reversed, so the first child is popped (and fully grown) first
+        for child_angles, child_width, child_inarow, child_bias, child_is_trunk in reversed(children):
+            stack.append((end_pos, child_angles, child_width, index, child_inarow, child_bias, child_is_trunk))
+
+    if width:
+        yield make_skeleton(length, pos, angles, width, parent, is_trunk, inarow, bushes)
+
+def make_skeleton(length, pos, angles, width, parent, is_trunk, inarow, bushes):
+    # from per-section lists
+    return Skeleton(
+        length,
+        np.array(pos, dtype=np.float64).reshape(-1, 3),
+        np.array(angles, dtype=np.float64).reshape(-1, 2),
+        np.array(width, dtype=np.float64),
+        np.array(parent, dtype=np.int64),
+        np.array(is_trunk, dtype=bool),
+        np.array(inarow, dtype=np.int64),
+        np.array(bushes, dtype=np.float64).reshape(-1, 3),
+    )
+
+def concat_skeletons(batches, length):
+    """One Skeleton from iter_skeleton's batches."""
+    join = lambda field: np.concatenate([getattr(batch, field) for batch in batches])
+    return Skeleton(length, join("pos"), join("angles"), join("width"), join("parent"), join("is_trunk"), join("inarow"), join("bushes"))
+
+def grow(TT, rng, angles, width, inarow, bias, is_trunk):
+    # children of one section as (angles, width, inarow, bias, is_trunk)
+    bias_factor = abs(angles[0] - bias[0])
+    if bias_factor < TT.MAX_DEVIATION.x:
+        bias_x = 0
+    elif angles[0] > bias[0]:
+        bias_x = -bias_factor * TT.BIAS_STRENGTH
+    else:
+        bias_x = bias_factor * TT.BIAS_STRENGTH
+
+    bias_y = 0
+    if bias[1] is not None:
+        bias_factor = abs(angles[1] - bias[1])
+        if bias_factor < TT.MAX_DEVIATION.y:
+            bias_y = 0
+        elif angles[1] > bias[1]:
+            bias_y = -bias_factor * TT.BIAS_STRENGTH
+        else:
+            bias_y = bias_factor * TT.BIAS_STRENGTH
+    bias_input = (bias_x, bias_y)
+
+    straight_chance = TT.STRAIGHT_CHANCE(width, is_trunk)
+
+    # make the trunk longer
+    if width >= TT.MIN_LOWER_TRUNK_WIDTH and inarow < TT.MIN_LOWER_TRUNK_LENGTH:
+        straight_chance = 1
+
+    n = TT.MAX_WIDTH
+    # TODO make parameter
+    if rng.random() > straight_chance or inarow > (-5/(n-1)*width + 5/(n-1)*n + 8):
+        return branch(TT, rng, angles, width, bias_input, is_trunk)
+    child_angles = straight_branch_angles(TT, rng, angles, bias_input)
+    child_width = width * (TT.STRAIGHT_WIDTH_TRUNK_MULTIPLIER if is_trunk else TT.STRAIGHT_WIDTH_BRANCH_MULTIPLIER)
+    return [(child_angles, child_width, inarow + 1, bias, is_trunk)]
+
+def straight_branch_angles(TT, rng, angles, bias_input):
+    return (
+        angles[0] + rng.gauss(bias_input[0], TT.STRAIGHT_DEVIATION_STDDEV.x),
+        angles[1] + rng.gauss(bias_input[1], TT.STRAIGHT_DEVIATION_STDDEV.y),
+    )
+
+def branch(TT, rng, angles, width, bias_input, is_trunk):
+    if width > TT.MIN_TRUNK_WIDTH:
+        branch_chance = (log(width-TT.MIN_TRUNK_WIDTH)/log(TT.MAX_WIDTH-TT.MIN_TRUNK_WIDTH)+1)/2 * TT.MAX_BRANCH_CHANCE
+    else:
+        branch_chance = 0
+
+    if rng.random() < branch_chance and is_trunk:
+        children_angles, widths, biases, trunks = branch_off_trunk(TT, rng, angles, width, bias_input)
+    else:
+        children_angles, widths, biases, trunks = branch_equally(TT, rng, angles, width, is_trunk)
+    return [(a, w, 0, b, t) for a, w, b, t in zip(children_angles, widths, biases, trunks)]
+
+def branch_off_trunk(TT, rng, angles, width, bias_input):
+    children_angles = [
+        straight_branch_angles(TT, rng, angles, bias_input),
+        (
+            angles[0] + rng.uniform(pi/8, pi/2 - angles[0]),
+            angles[1] + rng.uniform(-pi, pi),
+        )
+    ]
+    main_width = rng.uniform(width * 0.85, width * 0.86)
+    widths = [
+        main_width * TT.TRUNK_EXTRA,
+        (width - main_width) * TT.BRANCH_EXTRA
+    ]
+
+    biases = [(0, None), (TT.BRANCH_BIAS, children_angles[1][1])]
+    trunks = [True, False]
+
+    return children_angles, widths, biases, trunks
+
+def branch_equally(TT, rng, angles, width, is_trunk):
+    # TODO maybe generalise this? have some angle between forks, and some rotation angle (i.e. are the forks going sideways from eachother or up/down or inbetween), and calculate azimuth and elevation from that
+    # if we're going basically up, then make a fork i.e. like a Y shape
+    if angles[0] < pi/8:
+        children_angles = get_fork_angles(TT, rng, angles)
+    else:
+        # otherwise just branch randomly basically ecksdee
+        # TODO bias towards going in the same direction or something
+        children_angles = [
+            (
+                angles[0] + rng.gauss(pi/16, pi/32),
+                angles[1] + rng.gauss(3*pi/8, pi/10),
+            ),
+            (
+                angles[0] - rng.gauss(pi/16, pi/32),
+                angles[1] - rng.gauss(3*pi/8, pi/10),
+            )
+        ]
+
+    if is_trunk and width > TT.MIN_TRUNK_WIDTH:
+        biases = [(children_angles[0][0], None), (children_angles[1][0], None)]
+        trunks = [True, True]
+    else:
+        biases = [(TT.BRANCH_BIAS, children_angles[0][1]), (TT.BRANCH_BIAS, children_angles[1][1])]
+        trunks = [False, False]
+
+    clamp = lambda b: (min(max(b[0], -pi/4), pi/4), b[1])
+    biases = [clamp(b) for b in biases]
+    # TT.TODO different branching logic for big vs small branches
+    # big branches should aim to get away from the others (bias branches to go away from the centre) and be relatively long
+
+    # when branching, consider the current angle to decide what kind of yaw/azimuth the branch can be at. if going relatively up, any yaw angle is permitted, if going sideways, bias towards that direction.
+    # punish getting too far from the tree, or too close ot other branches
+    child_width = rng.gauss(0.5, 0.1) * width
+    widths = [
+        child_width * TT.TRUNK_EXTRA,
+        (width - child_width) * TT.TRUNK_EXTRA
+    ]
+
+    return children_angles, widths, biases, trunks
+
+def get_fork_angles(TT, rng, angles):
+    # make sure branches are somewhat different direction to eachother
+    azimuth_difference = rng.uniform(TT.FORK_AZIMUTH_DIFFERENCE_MEAN, TT.FORK_AZIMUTH_DIFFERENCE_STDDEV)
+    azimuth_a = rng.uniform(0, 2*pi)
+    azimuth_b = azimuth_a + azimuth_difference
+
+    elevation_a = abs(rng.gauss(angles[0] + TT.FORK_ELEVATION_MEAN, TT.FORK_ELEVATION_STDDEV))
+    elevation_b = abs(rng.gauss(angles[0] + TT.FORK_ELEVATION_MEAN, TT.FORK_ELEVATION_STDDEV))
+
+    return [
+        (elevation_a, azimuth_a),
+        (elevation_b, azimuth_b),
+    ]
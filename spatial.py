@@ -0,0 +1,118 @@
+import numpy as np
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+from stats import STATS
+
+class LeafIndex:
+    """Static spatial index over an (N, 3) point array, for batched radius counts.
+
+    Backed by scipy's cKDTree, which is built in one go from the array (no
+    per-point inserts) and searches every cell a query sphere overlaps, so
+    neighbours across cell boundaries are counted.
+    """
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.tree = cKDTree(self.points)
+        STATS.count("index nodes", self.tree.size)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query_many(self, positions, radius):
+        """Number of points strictly within radius of each position, as an int array."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        if len(self.points) == 0 or len(positions) == 0:
+            return np.zeros(len(positions), dtype=np.int64)
+        STATS.count("index queries", len(positions))
+        # cKDTree counts dist <= r, the octree it replaces counted dist < r
+        radius = np.nextafter(radius, 0)
+        return self.tree.query_ball_point(positions, radius, return_length=True, workers=-1).astype(np.int64)
+
+class DensityGrid:
+    """Point counts within radius, precomputed at the centres of a regular voxel grid around an index's points.
+
+    Built once from the index (one batched query over every voxel centre);
+    after that, counting points near any position is an array lookup,
+    trilinearly interpolated between voxel centres or from the nearest one.
+    """
+    def __init__(self, index, radius, voxel=1.0, interpolate=True):
+        self.radius = radius
+        self.voxel = voxel
+        self.order = 1 if interpolate else 0
+        if len(index) == 0:
+            self.lo = np.zeros(3)
+            shape = (1, 1, 1)
+        else:
+            # one voxel of margin beyond the farthest non-zero count, so lookups fade to zero at the edge
+            self.lo = index.points.min(axis=0) - radius - voxel
+            hi = index.points.max(axis=0) + radius + voxel
+            shape = tuple(np.ceil((hi - self.lo) / voxel).astype(np.int64) + 1)
+        axes = [self.lo[i] + np.arange(shape[i]) * voxel for i in range(3)]
+        centres = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+        self.counts = index.query_many(centres, radius).reshape(shape).astype(np.float64)
+
+    def query_many(self, positions, radius):
+        """Approximate LeafIndex.query_many, as floats; radius must be the one the grid was built with."""
+        if radius != self.radius:
+            raise ValueError(f"grid was built for radius {self.radius}, not {radius}")
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        STATS.count("grid lookups", len(positions))
+        coords = ((positions - self.lo) / self.voxel).T
+        # outside the grid there is nothing to count
+        return ndimage.map_coordinates(self.counts, coords, order=self.order, mode="constant", cval=0.0, prefilter=False)
+
+class BVH:
+    """Bounding volume hierarchy over axis-aligned boxes (rows of (N, 3) lo and hi arrays).
+
+    Built top down, splitting at the median box centre along each node's
+    longest axis. Queries walk only the nodes whose bounds pass a test, so
+    they cost about the number of boxes they find, not the number of boxes.
+    """
+    LEAF_SIZE = 2
+
+    def __init__(self, lo, hi):
+        self.lo = np.asarray(lo, dtype=np.float64).reshape(-1, 3)
+        self.hi = np.asarray(hi, dtype=np.float64).reshape(-1, 3)
+        # (lo, hi, left child, right child, items); items only on leaves
+        self.nodes = []
+        if len(self.lo):
+            self.build(np.arange(len(self.lo)))
+
+    def build(self, items):
+        node = len(self.nodes)
+        self.nodes.append(None)
+        lo = self.lo[items].min(axis=0)
+        hi = self.hi[items].max(axis=0)
+        if len(items) <= self.LEAF_SIZE:
+            self.nodes[node] = (lo, hi, None, None, items)
+            return node
+        axis = int(np.argmax(hi - lo))
+        centres = self.lo[items, axis] + self.hi[items, axis]
+        items = items[np.argsort(centres, kind="stable")]
+        half = len(items) // 2
+        left = self.build(items[:half])
+        right = self.build(items[half:])
+        self.nodes[node] = (lo, hi, left, right, None)
+        return node
+
+    def find(self, test):
+        """Sorted ids of the boxes for which test(lo, hi) is true; test must also hold for any box enclosing one it accepts."""
+        found = []
+        stack = [0] if self.nodes else []
+        visited = 0
+        while stack:
+            lo, hi, left, right, items = self.nodes[stack.pop()]
+            visited += 1
+            if not test(lo, hi):
+                continue
+            if items is None:
+                stack += [left, right]
+            else:
+                found += [int(i) for i in items if test(self.lo[i], self.hi[i])]
+        STATS.count("bvh nodes visited", visited)
+        return sorted(found)
+
+    def overlapping(self, lo, hi):
+        """Ids of the boxes that overlap the box lo-hi."""
+        return self.find(lambda a, b: bool(np.all(a <= hi) and np.all(b >= lo)))
@@ -0,0 +1,79 @@
+import os, time
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_PHASE = _NullPhase()
+
+class _Phase:
+    def __init__(self, stats, name, scope):
+        self.stats = stats
+        self.name = name
+        self.scope = scope
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.name, time.perf_counter() - self.start, self.scope)
+        return False
+
+class Stats:
+    """Opt-in wall times per phase (for the last tree and the last complete frame) and running hot-path counters.
+
+    When disabled, phase() returns a shared do-nothing context manager and
+    count() returns immediately, so instrumented code pays a call at most.
+    Counters are bumped once per batch, never per point.
+    """
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.tree = {}
+        self.frame = {}
+        self.last_frame = {}
+        self.counters = {}
+        self.frames = 0
+
+    def phase(self, name, scope="frame"):
+        # scope is "tree" or "frame"
+        if not self.enabled:
+            return NULL_PHASE
+        return _Phase(self, name, scope)
+
+    def record(self, name, seconds, scope="tree"):
+        # for timings measured elsewhere
+        if not self.enabled:
+            return
+        timings = self.tree if scope == "tree" else self.frame
+        timings[name] = timings.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def begin_tree(self):
+        if self.enabled:
+            self.tree = {}
+
+    def begin_frame(self):
+        if self.enabled:
+            self.last_frame = self.frame
+            self.frame = {}
+            self.frames += 1
+
+    def lines(self):
+        """Human-readable summary, one line per entry, for printing or the on-screen overlay."""
+        lines = [f"frame {self.frames}"]
+        # copies, trees can be generated on another thread while this runs
+        lines += [f"frame {name}: {seconds*1000:.2f}ms" for name, seconds in list(self.last_frame.items())]
+        lines += [f"tree {name}: {seconds*1000:.2f}ms" for name, seconds in list(self.tree.items())]
+        lines += [f"{name}: {n}" for name, n in sorted(list(self.counters.items()))]
+        return lines
+
+# shared instance; TREEGEN_STATS=1 (or main.py --stats) turns it on
+STATS = Stats(bool(os.environ.get("TREEGEN_STATS")))
@@ -0,0 +1,161 @@
+"""Generate trees over a grid of species parameters on every core, streaming per-tree stats as they finish.
+
+    python sweep.py --species Oak --seeds 1-50 --set BRANCH_EXTRA 1 1.2 1.5 --set LEAF_MAX_RAD 8 10 12 --out oak.csv
+    python sweep.py --set MAX_DEVIATION "Vec2(pi/8, pi/8)" "Vec2(pi/6, pi/6)" --out sweep.jsonl --thumbnails thumbs
+
+Each --set value is a Python expression (pi, sqrt and Vec2 are available).
+Variants are subclasses of the base species, so a parameter is picked up
+wherever it's read through the species, STRAIGHT_CHANCE included. Class
+constants the species define from others (DERIVED) are recomputed from the
+variant's values unless set themselves.
+"""
+import argparse, csv, itertools, json, math, os, statistics, time
+from multiprocessing import Pool
+
+import pygame
+
+import main
+from main import Vec2
+from raster import Rasterizer, render
+from render import parse_seeds, to_surface
+from tree import TreeGenerator
+
+FIELDS = ["variant", "seed", "sections", "bushes", "leaves", "max_depth",
+          "min_x", "min_y", "min_z", "max_x", "max_y", "max_z",
+          "trunk_time", "leaves_time", "index_time", "lighting_time"]
+# per-variant summaries are over these
+SUMMARY = ["sections", "bushes", "leaves", "max_depth", "trunk_time", "leaves_time", "index_time", "lighting_time"]
+
+def parse_value(expr):
+    return eval(expr, {"__builtins__": {}}, {"pi": math.pi, "sqrt": math.sqrt, "Vec2": Vec2})
+
+def make_variants(grid):
+    """Every combination of the grid's {name: [values]}, as a list of {name: value}."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+# species constants main.py computes from other constants at class creation, so a subclass would inherit stale values
+DERIVED = {
+    "MIN_TRUNK_WIDTH": lambda species: species.MAX_WIDTH * 0.3,
+    "MIN_LOWER_TRUNK_WIDTH": lambda species: 0.9 * species.MAX_WIDTH,
+}
+
+def make_species(base, overrides):
+    species = type(f"{base.__name__}Variant", (base,), dict(overrides))
+    for name, derive in DERIVED.items():
+        if name not in overrides:
+            setattr(species, name, derive(species))
+    return species
+
+def measure(seed, species, thumbnail=None, resolution=main.resolution):
+    """Stats for one generated tree; the lighting bake (and its time) only happens if thumbnail is a path to save to."""
+    tree = TreeGenerator(seed, species, main.LENGTH).generate()
+    s = tree.skeleton
+    points = tree.leaves if len(tree.leaves) else tree.trunk.pos
+    lo = points.min(axis=0).tolist() if len(points) else [0, 0, 0]
+    hi = points.max(axis=0).tolist() if len(points) else [0, 0, 0]
+    row = {
+        "seed": seed, "sections": len(s), "bushes": len(s.bushes), "leaves": len(tree.leaves),
+        "max_depth": int(s.depths().max()) if len(s) else 0,
+        "min_x": lo[0], "min_y": lo[1], "min_z": lo[2], "max_x": hi[0], "max_y": hi[1], "max_z": hi[2],
+        "trunk_time": tree.timings["trunk"], "leaves_time": tree.timings["leaves"], "index_time": tree.timings["index"],
+        "lighting_time": None,
+    }
+    if thumbnail:
+        start = time.perf_counter()
+        baked = main.bake_lighting(tree)
+        row["lighting_time"] = time.perf_counter() - start
+        rasterizer = Rasterizer(resolution)
+        render(rasterizer, main.tree_geometry(tree, baked), Vec2(math.pi/2, 0), Vec2(resolution//2, resolution//4*3))
+        pygame.image.save(to_surface(rasterizer.colour, rasterizer.source != Rasterizer.EMPTY), thumbnail)
+    return row
+
+def _sweep_job(job):
+    # species classes are built here rather than pickled, so only the base's name and plain values cross processes
+    n, overrides, seed, settings = job
+    base, thumbnails = settings
+    species = make_species(getattr(main, base), overrides)
+    thumbnail = thumbnails and os.path.join(thumbnails, f"variant{n:04d}_{seed}.png")
+    row = measure(seed, species, thumbnail)
+    row["variant"] = n
+    return row
+
+class ResultWriter:
+    """Streams rows to a .csv or .jsonl file, flushing each, so a long sweep can be watched (or killed) part way."""
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.file, FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def summarise(rows):
+    """Mean, min and max of each SUMMARY column over rows."""
+    summary = {}
+    for field in SUMMARY:
+        values = [row[field] for row in rows if row[field] is not None]
+        if values:
+            summary[field] = {"mean": statistics.fmean(values), "min": min(values), "max": max(values)}
+    return summary
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Sweep species parameters over many seeds.")
+    parser.add_argument("--species", choices=["Oak", "Poplar"], default="Poplar")
+    parser.add_argument("--seeds", nargs="+", default=["1-20"], help="seeds, or inclusive ranges like 100-199")
+    parser.add_argument("--set", nargs="+", action="append", default=[], metavar=("NAME", "VALUE"),
+                        help="a parameter and the values to try; repeat for more parameters")
+    parser.add_argument("--out", default="sweep.csv", help="per-tree results, .csv or .jsonl")
+    parser.add_argument("--summary", help="write per-variant parameters and summary statistics here as JSON")
+    parser.add_argument("--thumbnails", metavar="DIR", help="also light and render every tree into DIR")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    base = getattr(main, args.species)
+    grid = {}
+    for name, *values in args.set:
+        if not hasattr(base, name):
+            parser.error(f"{args.species} has no parameter {name}")
+        if not values:
+            parser.error(f"no values given for {name}")
+        grid[name] = [parse_value(value) for value in values]
+    variants = make_variants(grid)
+    seeds = parse_seeds(args.seeds)
+    if args.thumbnails:
+        os.makedirs(args.thumbnails, exist_ok=True)
+
+    settings = (args.species, args.thumbnails)
+    jobs = [(n, overrides, seed, settings) for n, overrides in enumerate(variants) for seed in seeds]
+    rows = [[] for _ in variants]
+    writer = ResultWriter(args.out)
+    start = time.time()
+    with Pool(args.jobs) as pool:
+        for row in pool.imap_unordered(_sweep_job, jobs, chunksize=max(1, len(jobs) // (args.jobs * 16))):
+            writer.write(row)
+            rows[row["variant"]].append(row)
+    writer.close()
+    elapsed = time.time() - start
+    print(f"{len(jobs)} trees ({len(variants)} variants x {len(seeds)} seeds) in {elapsed:.2f}s ({len(jobs) / elapsed:.2f} trees/s)")
+
+    summaries = []
+    for n, overrides in enumerate(variants):
+        summary = summarise(rows[n])
+        summaries.append({"variant": n, "parameters": {name: repr(value) for name, value in overrides.items()}, "summary": summary})
+        params = ", ".join(f"{name}={value!r}" for name, value in overrides.items())
+        print(f"{n:4}  sections {summary['sections']['mean']:7.1f}  bushes {summary['bushes']['mean']:6.1f}  "
+              f"leaves {summary['leaves']['mean']:8.0f}  depth {summary['max_depth']['mean']:5.1f}  {params}")
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
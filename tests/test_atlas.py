@@ -0,0 +1,25 @@
+import pytest
+
+from atlas import ShelfPacker
+
+def test_shelves_fill_left_to_right_then_down_then_onto_a_new_page():
+    packer = ShelfPacker(10, padding=1)
+    assert packer.place(4, 3) == (0, 0, 0)
+    assert packer.place(4, 5) == (0, 5, 0)
+    # next shelf under the tallest of the row
+    assert packer.place(4, 2) == (0, 0, 6)
+    assert packer.place(5, 5) == (1, 0, 0)
+
+def test_placements_never_overlap_or_leave_the_page():
+    packer = ShelfPacker(64, padding=1)
+    sizes = [(5 + i * 7 % 13, 3 + i * 5 % 11) for i in range(60)]
+    placed = [packer.place(w, h) + (w, h) for w, h in sizes]
+    for i, (page, x, y, w, h) in enumerate(placed):
+        assert x + w <= 64 and y + h <= 64
+        for other_page, ox, oy, ow, oh in placed[:i]:
+            if page == other_page:
+                assert x + w < ox or ox + ow < x or y + h < oy or oy + oh < y
+
+def test_too_big_a_rectangle_raises():
+    with pytest.raises(ValueError):
+        ShelfPacker(10).place(11, 1)
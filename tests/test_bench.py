@@ -0,0 +1,14 @@
+import bench
+
+def run(**phases):
+    return {"results": {species: {"total": totals} for species, totals in phases.items()}}
+
+def test_compare_flags_only_phases_past_the_threshold():
+    baseline = run(Oak={"leaves": 1.0, "raster": 1.0}, Poplar={"leaves": 2.0})
+    current = run(Oak={"leaves": 1.09, "raster": 1.2}, Poplar={"leaves": 1.0})
+    assert bench.compare(current, baseline, 0.1) == [("Oak", "raster")]
+
+def test_compare_skips_what_the_baseline_lacks():
+    baseline = run(Oak={"leaves": 1.0, "index": 0.0})
+    current = run(Oak={"leaves": 1.0, "index": 5.0, "present": 5.0}, Poplar={"leaves": 5.0})
+    assert bench.compare(current, baseline, 0.1) == []
@@ -0,0 +1,44 @@
+import os, threading
+from unittest import mock
+
+import numpy as np
+import pytest
+
+import main
+from cache import TreeCache, generate_cached, read_arrays, write_arrays
+
+def test_round_trip(tmp_path):
+    cache = TreeCache(str(tmp_path))
+    tree, baked = generate_cached(cache, 1, main.Oak, main.LENGTH, main.light_params())
+    cached, cached_baked = generate_cached(cache, 1, main.Oak, main.LENGTH, main.light_params())
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(cached.leaves, tree.leaves)
+    assert np.array_equal(cached.trunk.pos, tree.trunk.pos)
+    assert np.array_equal(cached_baked.leaves, baked.leaves)
+    assert np.array_equal(cached_baked.trunk, baked.trunk)
+
+def test_concurrent_writers_never_mix_files(tmp_path):
+    path = str(tmp_path / "x.tree")
+    errors = []
+
+    def worker(n):
+        try:
+            for _ in range(30):
+                write_arrays(path, {"a": np.full(50000, n)}, {"n": n})
+                arrays, meta = read_arrays(path)
+                assert (arrays["a"] == meta["n"]).all()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["x.tree"]
+
+def test_failed_write_leaves_no_temp_file(tmp_path):
+    with mock.patch("os.replace", side_effect=OSError("disk full")), pytest.raises(OSError):
+        write_arrays(str(tmp_path / "x.tree"), {"a": np.ones(10)}, {})
+    assert os.listdir(tmp_path) == []
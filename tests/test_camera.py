@@ -0,0 +1,32 @@
+from math import cos, pi, sin
+
+import numpy as np
+
+from camera import Camera
+from vec import Vec2
+
+def rotate_x(p, rad):
+    # the scalar helpers main.py projected with before Camera
+    x, y, z = p
+    return x, y * cos(rad) - z * sin(rad), y * sin(rad) + z * cos(rad)
+
+def rotate_z(p, rad):
+    x, y, z = p
+    return x * cos(rad) - y * sin(rad), x * sin(rad) + y * cos(rad), z
+
+def test_project_matches_scalar_rotations():
+    points = np.random.default_rng(1).uniform(-50, 50, (200, 3))
+    for ang in (Vec2(pi/2, 0), Vec2(1.9, 0.7), Vec2(-0.3, 4.0)):
+        expected = np.array([rotate_x(rotate_z(p, ang.y), ang.x) for p in points])
+        np.testing.assert_allclose(Camera(ang).project(points), expected, rtol=0, atol=1e-12)
+
+def test_unproject_inverts_project():
+    points = np.random.default_rng(2).uniform(-50, 50, (100, 3))
+    camera = Camera(Vec2(1.2, -0.4))
+    np.testing.assert_allclose(camera.unproject(camera.project(points)), points, rtol=0, atol=1e-12)
+
+def test_look_only_rebuilds_for_a_new_angle():
+    camera = Camera(Vec2(1.0, 2.0))
+    forward = camera.forward
+    assert camera.look(Vec2(1.0, 2.0)).forward is forward
+    assert camera.look(Vec2(1.0, 2.5)).forward is not forward
@@ -0,0 +1,25 @@
+import time
+from multiprocessing import Pool
+
+from export import imap_bounded
+
+def slow_square(n):
+    # later items finish first, so order has to come from imap_bounded
+    time.sleep((10 - n) * 0.002)
+    return n * n
+
+def test_imap_bounded_keeps_order_and_window():
+    submitted = []
+
+    def items():
+        for n in range(10):
+            submitted.append(n)
+            yield n
+
+    with Pool(3) as pool:
+        results = []
+        for result in imap_bounded(pool, slow_square, items(), 3):
+            # never more than the window submitted ahead of what's been consumed
+            assert len(submitted) - len(results) <= 3
+            results.append(result)
+    assert results == [n * n for n in range(10)]
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import main
+from leafgen import frange_array, make_leaf_points, unit_shell
+
+def frange(x, y, jump):
+    # the scalar loop main.py sampled shells with
+    values = []
+    while x < y:
+        values.append(x)
+        x += jump
+    return values
+
+@pytest.mark.parametrize("x, y, jump", [(0, 3*np.pi/5, 0.1), (-np.pi, np.pi, 2*np.pi/37.3), (0, np.pi, 0.013)])
+def test_frange_array_matches_the_scalar_loop(x, y, jump):
+    assert frange_array(x, y, jump).tolist() == frange(x, y, jump)
+
+def test_leaves_are_laid_out_bush_by_bush():
+    bushes = np.array([[0.0, 0.0, 0.0], [50.0, 0.0, 20.0], [-30.0, 10.0, 40.0]])
+    radii = [4.5, 9.0, 6.2]
+    points = make_leaf_points(bushes, radii, main.Oak)
+    start = 0
+    for bush, radius in zip(bushes, radii):
+        count = len(unit_shell(main.Oak, 1.0, radius)[1])
+        distance = np.linalg.norm(points[start:start + count] - bush, axis=1)
+        assert distance.max() <= radius + 1e-9
+        start += count
+    assert start == len(points)
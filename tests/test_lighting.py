@@ -0,0 +1,42 @@
+from math import sqrt
+
+import numpy as np
+
+import main
+from lighting import LightCache, raycast_many
+from main import Vec3
+from spatial import LeafIndex
+
+def test_light_cache_bakes_once_per_key():
+    bakes = []
+    cache = LightCache(lambda: bakes.append(1) or len(bakes))
+    assert cache.get("a") == 1
+    assert cache.get("a") == 1
+    assert cache.get("b") == 2
+    assert cache.bakes == 2
+
+def test_changing_the_light_direction_rebakes(monkeypatch):
+    main.make_tree(1)
+    before = main.lights()
+    bakes = main.light_cache.bakes
+    assert main.lights() is before
+
+    monkeypatch.setattr(main, "LIGHT_DIR", Vec3(1/sqrt(2), 0, 1/sqrt(2)))
+    after = main.lights()
+    assert main.light_cache.bakes == bakes + 1
+    assert not np.array_equal(after.leaves, before.leaves)
+    assert main.lights() is after
+
+def test_raycast_many_matches_marching_each_ray_alone():
+    rng = np.random.default_rng(4)
+    index = LeafIndex(rng.uniform(-10, 10, (3000, 3)))
+    origins = rng.uniform(-10, 10, (50, 3))
+    light_dir = np.array([0, 1/sqrt(2), 1/sqrt(2)])
+    expected = []
+    for origin in origins:
+        ray, light = origin + light_dir * 3, 1.0
+        for _ in range(30):
+            light *= 0.98 ** int(index.query_many([ray], 3)[0])
+            ray = ray + light_dir
+        expected.append(light)
+    np.testing.assert_allclose(raycast_many(origins, index, light_dir, 3, 0.98), expected, rtol=1e-12)
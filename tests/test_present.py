@@ -0,0 +1,32 @@
+import numpy as np
+import pygame
+
+from present import FrameCache, Presenter
+
+def test_present_blits_the_colour_buffer_scaled_without_a_display():
+    resolution, scl = 4, 3
+    colour = np.arange(resolution * resolution * 3, dtype=np.uint8).reshape(resolution, resolution, 3) * 5
+    target = pygame.Surface((resolution * scl, resolution * scl))
+    Presenter(resolution, scl).present(target, colour)
+    for y in range(1, resolution):
+        for x in range(resolution):
+            # the centre of each scaled pixel, drawn half a pixel up
+            assert tuple(target.get_at((x * scl + 1, y * scl + 1 - scl // 2)))[:3] == tuple(colour[y, x])
+
+def test_frame_cache_evicts_the_least_recently_used():
+    cache = FrameCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert list(cache.frames) == ["a", "c"]
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_frame_cache_put_refreshes_an_existing_key():
+    cache = FrameCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 3)
+    cache.put("c", 4)
+    assert dict(cache.frames) == {"a": 3, "c": 4}
@@ -0,0 +1,54 @@
+from math import pi
+
+import numpy as np
+import pytest
+
+import main
+from main import Vec2
+from raster import Rasterizer, render
+from render import parse_seeds, render_tree
+from tree import TreeGenerator
+
+SEED = 1720987585756419465
+
+def trunk_pixels_drawn(resolution):
+    zoom = resolution / main.resolution
+    tree = TreeGenerator(SEED, main.Poplar, main.LENGTH, zoom).generate()
+    geometry = main.tree_geometry(tree, tree.bake(*main.light_params()))
+    rasterizer = Rasterizer(resolution)
+    render(rasterizer, geometry, Vec2(pi/2, 0), Vec2(resolution//2, resolution//4*3))
+    drawn = rasterizer.source[rasterizer.source != Rasterizer.EMPTY]
+    return tree, np.count_nonzero(drawn < len(tree.trunk.pos))
+
+@pytest.mark.parametrize("resolution", [16, 32, 48, 64, 100])
+def test_low_resolution_keeps_trunk(resolution):
+    tree, trunk = trunk_pixels_drawn(resolution)
+    assert tree.trunk.width.min() >= 1
+    assert trunk > 0
+
+def test_rasterizer_keeps_the_nearest_point_and_the_first_of_a_tie():
+    rasterizer = Rasterizer(4)
+    colours = np.array([[10, 0, 0], [20, 0, 0], [30, 0, 0], [40, 0, 0], [50, 0, 0]], dtype=np.uint8)
+    x = np.array([1, 1, 2, 2, 9])
+    y = np.array([1, 1, 3, 3, 0])
+    z = np.array([5.0, 2.0, 1.0, 1.0, 0.0])
+    rasterizer.draw(x, y, z, colours, np.arange(5))
+    assert rasterizer.source[1, 1] == 1
+    assert rasterizer.source[3, 2] == 2
+    assert rasterizer.depth[1, 1] == 2.0
+    # off the buffer, dropped
+    assert np.count_nonzero(rasterizer.source != Rasterizer.EMPTY) == 2
+    # a later, further point doesn't replace a nearer one
+    rasterizer.draw(np.array([1]), np.array([1]), np.array([3.0]), colours[:1], np.array([7]))
+    assert rasterizer.source[1, 1] == 1
+
+# pixels drawn and the sum of their colour channels, for SEED seen from the side
+PINNED = {("Oak", 48): (101, 36719), ("Oak", 100): (377, 136186), ("Poplar", 48): (190, 66191), ("Poplar", 100): (741, 252806)}
+
+@pytest.mark.parametrize("species, resolution", PINNED)
+def test_render_is_pinned(species, resolution):
+    colour, mask = render_tree(SEED, species, resolution, Vec2(pi/2, 0))
+    assert (int(mask.sum()), int(colour.astype(np.int64).sum())) == PINNED[species, resolution]
+
+def test_parse_seeds():
+    assert parse_seeds(["3", "7-9", "-2"]) == [3, 7, 8, 9, -2]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import main
+from main import Vec2
+from camera import Camera
+from raster import TrunkCloud
+from scene import Instance, Scene
+from spatial import BVH
+from tree import Tree, TreeGenerator
+
+LIGHT = (np.array(main.LIGHT_DIR.tup()), main.LEAF_RAD, main.LEAF_TRANSMITTANCE)
+
+@pytest.fixture(scope="module")
+def tree():
+    return TreeGenerator(1, main.Oak, main.LENGTH, 0.32).generate()
+
+def random_boxes(rng, count):
+    lo = rng.uniform(-50, 50, (count, 3))
+    return lo, lo + rng.uniform(0, 10, (count, 3))
+
+def test_bvh_overlapping_matches_brute_force():
+    rng = np.random.default_rng(5)
+    lo, hi = random_boxes(rng, 200)
+    bvh = BVH(lo, hi)
+    for qlo, qhi in zip(*random_boxes(rng, 50)):
+        expected = np.flatnonzero(np.all(lo <= qhi, axis=1) & np.all(hi >= qlo, axis=1)).tolist()
+        assert bvh.overlapping(qlo, qhi) == expected
+
+def test_empty_bvh_finds_nothing():
+    assert BVH(np.empty((0, 3)), np.empty((0, 3))).overlapping(np.zeros(3), np.ones(3)) == []
+
+def test_visible_is_the_instances_projected_onto_the_raster(tree):
+    positions = [(x, y, 0) for x in range(-400, 401, 100) for y in range(-400, 401, 100)]
+    scene = Scene(Instance(tree, position, yaw=i) for i, position in enumerate(positions))
+    camera, origin, resolution = Camera(Vec2(1.2, 0.4)), Vec2(50, 75), 100
+    expected = []
+    for i, instance in enumerate(scene.instances):
+        ss = camera.project(np.concatenate((instance.leaves, instance.trunk.pos)))[:, :2] * scene.zoom + origin.tup()
+        if np.any(np.all((ss >= 0) & (ss < resolution), axis=1)):
+            expected.append(i)
+    visible = scene.visible(camera, origin, resolution)
+    # bounds can reach the raster where no point does, never the other way round
+    assert set(expected) <= set(visible)
+    assert len(visible) < len(positions)
+
+def test_a_lone_instance_is_lit_like_its_tree(tree):
+    # at the origin and unturned, so world and local coordinates agree exactly
+    baked = tree.bake(*LIGHT)
+    [placed] = Scene([Instance(tree, (0, 0, 0))]).bake(*LIGHT)
+    assert np.array_equal(placed.leaves, baked.leaves)
+    assert np.array_equal(placed.trunk, baked.trunk)
+
+def test_neighbours_shade_each_other(tree):
+    [alone] = Scene([Instance(tree, (0, 0, 0))]).bake(*LIGHT)
+    # the light comes from +y, so a tree there shades this one
+    shaded = Scene([Instance(tree, (0, 0, 0)), Instance(tree, (0, 10, 0))]).bake(*LIGHT)[0]
+    assert np.all(shaded.leaves <= alone.leaves + 1e-12)
+    assert shaded.leaves.sum() < alone.leaves.sum()
+
+def test_an_empty_instance_has_bounds_where_it_stands(tree):
+    empty = Tree(1, main.Oak, tree.skeleton, np.empty((0, 3)), TrunkCloud(np.empty((0, 3)), np.empty(0), np.empty(0, dtype=bool)), None, {}, tree.zoom)
+    instance = Instance(empty, (5, 6, 7))
+    assert instance.lo.tolist() == instance.hi.tolist() == [5, 6, 7]
+    scene = Scene([instance, Instance(tree, (0, 0, 0))])
+    assert [len(light.leaves) for light in scene.bake(*LIGHT)] == [0, len(tree.leaves)]
@@ -0,0 +1,37 @@
+import random
+
+import numpy as np
+import pytest
+
+import main
+from skeleton import build_skeleton, concat_skeletons, iter_skeleton
+
+SEED = 1720987585756419465
+
+# (sections, bushes), then sums of section start positions and widths
+PINNED = {
+    "Oak": ((65, 20), (951.5468110018451, 153.31701629434997)),
+    "Poplar": ((135, 22), (4518.860660277062, 337.44468952801185)),
+}
+
+@pytest.mark.parametrize("species", PINNED)
+def test_skeleton_is_pinned(species):
+    counts, sums = PINNED[species]
+    skeleton = build_skeleton(getattr(main, species), random.Random(SEED), main.LENGTH)
+    assert (len(skeleton), len(skeleton.bushes)) == counts
+    assert (skeleton.pos.sum(), skeleton.width.sum()) == pytest.approx(sums, rel=1e-12)
+
+def test_parents_come_first_and_children_start_where_parents_end():
+    skeleton = build_skeleton(main.Oak, random.Random(SEED), main.LENGTH)
+    parent = skeleton.parent
+    assert parent[0] == -1
+    assert np.all(parent[1:] < np.arange(1, len(skeleton)))
+    ends = skeleton.pos + skeleton.directions() * skeleton.length
+    np.testing.assert_allclose(skeleton.pos[1:], ends[parent[1:]], atol=1e-9)
+    assert np.array_equal(skeleton.depths()[1:], skeleton.depths()[parent[1:]] + 1)
+
+def test_batches_join_into_the_whole_skeleton():
+    whole = build_skeleton(main.Poplar, random.Random(SEED), main.LENGTH)
+    joined = concat_skeletons(list(iter_skeleton(main.Poplar, random.Random(SEED), main.LENGTH, 16)), main.LENGTH)
+    for name in ("pos", "angles", "width", "parent", "is_trunk", "inarow", "bushes"):
+        assert np.array_equal(getattr(joined, name), getattr(whole, name))
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from spatial import DensityGrid, LeafIndex
+
+def brute_force_counts(points, positions, radius):
+    distance = np.linalg.norm(positions[:, None, :] - points[None, :, :], axis=2)
+    return (distance < radius).sum(axis=1)
+
+def test_leaf_index_counts_match_brute_force():
+    rng = np.random.default_rng(3)
+    points = rng.uniform(-10, 10, (2000, 3))
+    positions = rng.uniform(-12, 12, (300, 3))
+    assert np.array_equal(LeafIndex(points).query_many(positions, 3), brute_force_counts(points, positions, 3))
+
+def test_points_exactly_at_the_radius_are_not_counted():
+    index = LeafIndex([[3.0, 0.0, 0.0], [0.0, 2.999, 0.0]])
+    assert index.query_many([[0.0, 0.0, 0.0]], 3).tolist() == [1]
+
+def test_empty_index_counts_nothing():
+    assert LeafIndex(np.empty((0, 3))).query_many([[0.0, 0.0, 0.0]], 3).tolist() == [0]
+
+def test_density_grid_is_exact_at_voxel_centres():
+    rng = np.random.default_rng(4)
+    index = LeafIndex(rng.uniform(-10, 10, (2000, 3)))
+    grid = DensityGrid(index, 3, voxel=2.0)
+    centres = grid.lo + rng.integers(0, 8, (100, 3)) * grid.voxel
+    assert np.array_equal(grid.query_many(centres, 3), index.query_many(centres, 3))
+    nearest = DensityGrid(index, 3, voxel=2.0, interpolate=False)
+    assert np.array_equal(nearest.query_many(centres + 0.4, 3), index.query_many(centres, 3))
+
+def test_density_grid_is_empty_outside_its_bounds():
+    grid = DensityGrid(LeafIndex([[0.0, 0.0, 0.0]]), 3)
+    assert grid.query_many([[100.0, 0.0, 0.0]], 3).tolist() == [0]
+
+def test_density_grid_rejects_another_radius():
+    grid = DensityGrid(LeafIndex([[0.0, 0.0, 0.0]]), 3)
+    with pytest.raises(ValueError):
+        grid.query_many([[0.0, 0.0, 0.0]], 4)
@@ -0,0 +1,26 @@
+import pytest
+
+import main
+import sweep
+
+def test_make_species_overrides_and_recomputes_derived_constants():
+    species = sweep.make_species(main.Oak, {"MAX_WIDTH": 10, "LEAF_MAX_RAD": 12})
+    assert issubclass(species, main.Oak)
+    assert (species.MAX_WIDTH, species.LEAF_MAX_RAD) == (10, 12)
+    assert species.MIN_TRUNK_WIDTH == pytest.approx(3)
+    assert species.MIN_LOWER_TRUNK_WIDTH == pytest.approx(9)
+    # read through the species, so it follows the override
+    assert species.STRAIGHT_CHANCE(5, False) != main.Oak.STRAIGHT_CHANCE(5, False)
+
+def test_make_species_keeps_an_explicit_derived_value():
+    species = sweep.make_species(main.Oak, {"MAX_WIDTH": 10, "MIN_TRUNK_WIDTH": 1})
+    assert species.MIN_TRUNK_WIDTH == 1
+    assert species.MIN_LOWER_TRUNK_WIDTH == pytest.approx(9)
+
+def test_make_species_leaves_the_base_alone():
+    before = {name: getattr(main.Poplar, name) for name in ("MAX_WIDTH", "MIN_TRUNK_WIDTH", "MIN_LOWER_TRUNK_WIDTH")}
+    sweep.make_species(main.Poplar, {"MAX_WIDTH": 20})
+    assert {name: getattr(main.Poplar, name) for name in before} == before
+
+def test_make_variants_is_the_grid_product():
+    assert sweep.make_variants({"A": [1, 2], "B": [3]}) == [{"A": 1, "B": 3}, {"A": 2, "B": 3}]
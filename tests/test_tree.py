@@ -0,0 +1,70 @@
+from multiprocessing import Pool
+
+import numpy as np
+import pytest
+from scipy.spatial import cKDTree
+
+import main
+from leafgen import bush_radii, make_leaf_points, make_leaf_points_parallel, unit_shell
+from tree import TreeGenerator
+
+# (leaves, trunk samples) for seed 1 at each zoom
+SAMPLES = {
+    ("Oak", 0.32): (1401, 68), ("Oak", 1.0): (11133, 136), ("Oak", 2.0): (42609, 272),
+    ("Poplar", 0.32): (1164, 152), ("Poplar", 1.0): (9969, 304), ("Poplar", 2.0): (38448, 608),
+}
+
+@pytest.mark.parametrize("species, zoom", SAMPLES)
+def test_sample_counts_are_pinned(species, zoom):
+    tree = TreeGenerator(1, getattr(main, species), main.LENGTH, zoom).generate()
+    assert (len(tree.leaves), len(tree.trunk.pos)) == SAMPLES[species, zoom]
+
+def shell_pixels(species, density, radius, zoom):
+    dirs, r = unit_shell(species, density, radius)
+    return dirs * (r * radius * zoom)[:, None]
+
+@pytest.mark.parametrize("species", ["Oak", "Poplar"])
+@pytest.mark.parametrize("zoom", [0.32, 1.0, 4.0])
+def test_shells_have_no_pixel_gaps(species, zoom):
+    species = getattr(main, species)
+    for radius in (species.LEAF_MIN_RAD, species.LEAF_MAX_RAD):
+        # every point of a much finer sampling of the same shell is within a pixel of a leaf
+        gaps, _ = cKDTree(shell_pixels(species, zoom, radius, zoom)).query(shell_pixels(species, 8 * zoom, radius, zoom))
+        assert gaps.max() < 0.75
+
+def test_repeated_generate_gives_the_same_tree():
+    generator = TreeGenerator(1, main.Oak, main.LENGTH)
+    first, second = generator.generate(), generator.generate()
+    assert np.array_equal(first.skeleton.pos, second.skeleton.pos)
+    assert np.array_equal(first.leaves, second.leaves)
+    streamed = [piece.pos for kind, piece in generator.stream() if kind == "sections"]
+    assert np.array_equal(np.concatenate(streamed), first.skeleton.pos)
+
+@pytest.mark.parametrize("zoom", [0.3, 1.0, 2.5])
+def test_stream_matches_generate(zoom):
+    tree = TreeGenerator(1, main.Poplar, main.LENGTH, zoom).generate()
+    pieces = {"sections": [], "trunk": [], "leaves": []}
+    for kind, piece in TreeGenerator(1, main.Poplar, main.LENGTH, zoom).stream(64, 5000):
+        pieces[kind].append(piece)
+    assert np.array_equal(np.concatenate([p.pos for p in pieces["sections"]]), tree.skeleton.pos)
+    assert np.array_equal(np.concatenate([p.pos for p in pieces["trunk"]]), tree.trunk.pos)
+    assert np.array_equal(np.concatenate([p.width for p in pieces["trunk"]]), tree.trunk.width)
+    assert np.array_equal(np.concatenate(pieces["leaves"]), tree.leaves)
+
+def test_parallel_leaves_match_serial():
+    serial = TreeGenerator(1, main.Oak, main.LENGTH, 2.0).generate()
+    for jobs in (1, 3):
+        with Pool(jobs) as pool:
+            assert np.array_equal(TreeGenerator(1, main.Oak, main.LENGTH, 2.0, pool).generate().leaves, serial.leaves)
+
+def test_parallel_chunks_match_serial():
+    rng = np.random.default_rng(6)
+    positions = rng.uniform(-20, 20, (13, 3))
+    radii = bush_radii(1, main.Poplar, 13)
+    serial = make_leaf_points(positions, radii, main.Poplar)
+    with Pool(2) as pool:
+        for chunks in (1, 4, 13, 50):
+            assert np.array_equal(make_leaf_points_parallel(pool, positions, radii, main.Poplar, chunks=chunks), serial)
+
+def test_bush_radii_do_not_depend_on_the_batch():
+    assert bush_radii(1, main.Oak, 5, start=7) == bush_radii(1, main.Oak, 12)[7:]
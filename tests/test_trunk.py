@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+import main
+from tree import TreeGenerator
+
+@pytest.mark.parametrize("zoom", [1.0, 2.0])
+def test_trunk_samples_run_along_each_section(zoom):
+    generator = TreeGenerator(1, main.Oak, main.LENGTH, zoom)
+    skeleton = generator.generate().skeleton
+    cloud = generator.make_trunk_cloud(skeleton)
+    per_section = len(cloud.pos) // len(skeleton)
+    assert per_section * len(skeleton) == len(cloud.pos)
+    pos = cloud.pos.reshape(len(skeleton), per_section, 3)
+    np.testing.assert_allclose(pos[:, 0], skeleton.pos)
+    # a pixel apart, along the section
+    steps = np.diff(pos, axis=1)
+    np.testing.assert_allclose(steps, np.broadcast_to(skeleton.directions()[:, None, :] / zoom, steps.shape), atol=1e-12)
+    assert np.array_equal(cloud.is_trunk.reshape(len(skeleton), per_section)[:, 0], skeleton.is_trunk)
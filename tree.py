@@ -0,0 +1,162 @@
+import random, time
+from math import ceil
+
+import numpy as np
+
+from leafgen import bush_radii, leaf_weight, make_leaf_points, make_leaf_points_parallel, unit_shell
+from lighting import BakedLight, raycast_many
+from raster import TrunkCloud
+from skeleton import build_skeleton, iter_skeleton
+from spatial import DensityGrid, LeafIndex
+from stats import STATS
+
+# bump whenever a change makes the same seed generate a different tree, so stale cached trees are ignored
+GENERATOR_VERSION = 5
+
+class Tree:
+    """Everything generated for one seed. Holds no references to module state, so trees can be built side by side."""
+    def __init__(self, seed, species, skeleton, leaves, trunk, index, timings, zoom=1.0):
+        self.seed = seed
+        self.species = species
+        # pixels per world unit the tree was sampled for
+        self.zoom = zoom
+        self.skeleton = skeleton
+        # (N, 3) leaf points
+        self.leaves = leaves
+        self.trunk = trunk
+        self._index = index
+        # wall time per generation phase, in seconds
+        self.timings = timings
+        # DensityGrids by (radius, voxel); the leaves never change, so one grid serves every light direction
+        self.grids = {}
+
+    @property
+    def index(self):
+        # trees loaded from the cache come with their lighting, so only build the index if something asks
+        if self._index is None:
+            self._index = LeafIndex(self.leaves)
+        return self._index
+
+    def density(self, radius, voxel):
+        if (radius, voxel) not in self.grids:
+            with STATS.phase("density grid", "tree"):
+                self.grids[radius, voxel] = DensityGrid(self.index, radius, voxel)
+        return self.grids[radius, voxel]
+
+    def occluders(self, radius, voxel=None):
+        # what lighting counts leaves in: the exact index, or a density grid of that voxel size
+        return self.index if voxel is None else self.density(radius, voxel)
+
+    def leaf_transmittance(self, transmittance):
+        # denser shells have more, smaller leaves; each one lets proportionally more light through
+        return transmittance ** (leaf_weight(self.species, len(self.skeleton.bushes), len(self.leaves)) * self.species.LEAF_OPACITY)
+
+    def bake(self, light_dir, radius, transmittance, voxel=None, progress=None):
+        """Light every leaf and trunk sample from light_dir.
+
+        With voxel set, leaves along each ray are counted from a density grid
+        of that voxel size instead of exactly. progress, if given, is called
+        with (phase, fraction) as the bake goes.
+        """
+        if progress:
+            progress("density grid" if voxel is not None else "lighting")
+        occluders = self.occluders(radius, voxel)
+        transmittance = self.leaf_transmittance(transmittance)
+
+        def light(origins, part):
+            # leaves are the first half of the work, trunk samples the second
+            on_step = progress and (lambda fraction: progress("lighting", (part + fraction) / 2))
+            return raycast_many(origins, occluders, light_dir, radius, transmittance, on_step=on_step)
+
+        with STATS.phase("lighting", "tree"):
+            return BakedLight(light(self.leaves, 0), light(self.trunk.pos, 1))
+
+class TreeGenerator:
+    """Generation context for one tree: its own random stream and species, nothing shared.
+
+    The same (seed, species) always gives a bit-identical tree, whichever
+    thread or process builds it and whatever else is being built alongside.
+
+    zoom is the number of pixels per world unit the tree will be drawn at.
+    Leaf shells and trunk samples are spaced to match, so bigger renders get
+    denser trees without holes and smaller ones don't pay for points that
+    land on the same pixel. The skeleton doesn't depend on it.
+
+    The skeleton draws from a random stream seeded afresh by every
+    generate() or stream() call, so repeated calls give the same tree. Each
+    bush's leaves draw from their own, seeded by (seed, bush index). With a
+    multiprocessing pool, leaves are generated across its workers, with the
+    same result; the pool stays the caller's to close (use it in a with
+    block, so an error terminates the workers).
+    """
+    def __init__(self, seed, species, length, zoom=1.0, pool=None):
+        self.seed = seed
+        self.species = species
+        self.length = length
+        self.zoom = zoom
+        self.pool = pool
+
+    def generate(self, progress=None):
+        # progress, if given, is called with each phase's name as it starts
+        progress = progress or (lambda phase: None)
+        STATS.begin_tree()
+        a = time.perf_counter()
+        progress("skeleton")
+        skeleton = build_skeleton(self.species, random.Random(self.seed), self.length)
+        trunk = self.make_trunk_cloud(skeleton)
+        b = time.perf_counter()
+
+        progress("leaves")
+        leaves = self.make_leaves(skeleton.bushes)
+        c = time.perf_counter()
+
+        progress("index")
+        index = LeafIndex(leaves)
+        d = time.perf_counter()
+
+        timings = {"trunk": b-a, "leaves": c-b, "index": d-c}
+        for name, seconds in timings.items():
+            STATS.record(name, seconds)
+        STATS.count("sections", len(skeleton))
+        STATS.count("bushes", len(skeleton.bushes))
+        STATS.count("leaves", len(leaves))
+        return Tree(self.seed, self.species, skeleton, leaves, trunk, index, timings, self.zoom)
+
+    def stream(self, section_batch=256, leaf_batch=65536):
+        """Generate in pieces instead of all at once, yielding (kind, piece) as each is ready.
+
+        For every batch of up to section_batch sections, as the skeleton
+        grows: ("sections", Skeleton), ("trunk", TrunkCloud) for those
+        sections, then ("leaves", (N, 3) array) for the bushes among them, in
+        chunks of whole bushes up to leaf_batch points each (one bush if a
+        bush is bigger). Joined up, the pieces are exactly what generate()
+        builds from the same seed. Nothing is held on to here, so memory is
+        bounded by what the consumer keeps.
+        """
+        # sized for the biggest possible bush, so no chunk goes over leaf_batch unless one bush does
+        per_chunk = max(1, leaf_batch // len(unit_shell(self.species, self.zoom, self.species.LEAF_MAX_RAD)[1]))
+        first_bush = 0
+        for batch in iter_skeleton(self.species, random.Random(self.seed), self.length, section_batch):
+            yield "sections", batch
+            yield "trunk", self.make_trunk_cloud(batch)
+            for start in range(0, len(batch.bushes), per_chunk):
+                bushes = batch.bushes[start:start + per_chunk]
+                yield "leaves", self.make_leaves(bushes, first_bush + start)
+            first_bush += len(batch.bushes)
+
+    def make_leaves(self, bushes, first_bush=0):
+        # bushes are numbered from first_bush, for their random streams
+        max_radii = bush_radii(self.seed, self.species, len(bushes), first_bush)
+        if self.pool is not None:
+            return make_leaf_points_parallel(self.pool, bushes, max_radii, self.species, self.zoom)
+        return make_leaf_points(bushes, max_radii, self.species, self.zoom)
+
+    def make_trunk_cloud(self, skeleton):
+        # every trunk pixel sample along each section, sections in skeleton (depth-first) order, one pixel apart at zoom.
+        # At least one sample a section, at least a pixel wide, so low zooms still draw a trunk
+        per_section = max(1, ceil(skeleton.length * self.zoom))
+        n = np.arange(per_section) / self.zoom
+        pos = skeleton.directions()[:, None, :] * n[None, :, None] + skeleton.pos[:, None, :]
+        width = np.round((np.round(skeleton.width / self.species.MAX_WIDTH * 2.8) + 1) * self.zoom).astype(np.int64)
+        width = np.maximum(width, 1)
+        return TrunkCloud(pos.reshape(-1, 3), np.repeat(width, per_section), np.repeat(skeleton.is_trunk, per_section))
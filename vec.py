@@ -0,0 +1,145 @@
+import numpy as np
+
+class Vec2:
+    """Small 2D vector for the scalar code paths. Anything done per point in bulk should use arrays instead."""
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    @classmethod
+    def from_array(cls, array):
+        x, y = array.tolist()
+        return cls(x, y)
+
+    def tup(self):
+        return (self.x, self.y)
+
+    def array(self):
+        return np.array((self.x, self.y), dtype=np.float64)
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __add__(self, other):
+        if other.__class__ is not Vec2:
+            return NotImplemented
+        return Vec2(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other):
+        if other.__class__ is not Vec2:
+            return NotImplemented
+        return Vec2(self.x - other.x, self.y - other.y)
+
+    def __mul__(self, other):
+        if other.__class__ in VECTORS:
+            return NotImplemented
+        return Vec2(self.x * other, self.y * other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vec2(-self.x, -self.y)
+
+    def __iadd__(self, other):
+        if other.__class__ is not Vec2:
+            return NotImplemented
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other):
+        if other.__class__ is not Vec2:
+            return NotImplemented
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, other):
+        if other.__class__ in VECTORS:
+            return NotImplemented
+        self.x *= other
+        self.y *= other
+        return self
+
+    def __repr__(self):
+        return f"Vec2({self.x}, {self.y})"
+
+class Vec3:
+    """Small 3D vector for the scalar code paths. Anything done per point in bulk should use arrays instead."""
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_array(cls, array):
+        x, y, z = array.tolist()
+        return cls(x, y, z)
+
+    def xy(self) -> Vec2:
+        return Vec2(self.x, self.y)
+
+    def tup(self):
+        return (self.x, self.y, self.z)
+
+    def array(self):
+        return np.array((self.x, self.y, self.z), dtype=np.float64)
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __add__(self, other):
+        if other.__class__ is not Vec3:
+            return NotImplemented
+        return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        if other.__class__ is not Vec3:
+            return NotImplemented
+        return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, other):
+        if other.__class__ in VECTORS:
+            return NotImplemented
+        return Vec3(self.x * other, self.y * other, self.z * other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vec3(-self.x, -self.y, -self.z)
+
+    def __iadd__(self, other):
+        if other.__class__ is not Vec3:
+            return NotImplemented
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __isub__(self, other):
+        if other.__class__ is not Vec3:
+            return NotImplemented
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __imul__(self, other):
+        if other.__class__ in VECTORS:
+            return NotImplemented
+        self.x *= other
+        self.y *= other
+        self.z *= other
+        return self
+
+    def __repr__(self):
+        return f"Vec3({self.x}, {self.y}, {self.z})"
+
+VECTORS = (Vec2, Vec3)